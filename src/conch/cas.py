@@ -1,61 +1,887 @@
+import asyncio
+import codecs
+import gzip
+import io
+import lzma
 import os
 import hashlib
 import sqlite3
-from typing import Optional
+import sys
+import tempfile
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from typing import IO, Iterable, Iterator, Optional, Union
 
-MAX_SIZE = 4 * 1024 * 1024  # 4MB
+MAX_SIZE = 4 * 1024 * 1024  # 4MB, for put/put_many; put_stream has no cap
+STREAM_CHUNK = 64 * 1024
+
+# Content-defined chunking. Objects above CHUNK_THRESHOLD are split at line
+# ends chosen by the content itself, so an edit only changes the chunks it
+# touches and near-identical snapshots share the rest.
+CHUNK_THRESHOLD = 32 * 1024
+MIN_CHUNK = 2 * 1024
+MAX_CHUNK = 64 * 1024
+CHUNK_MASK = 0x3F  # a line ends a chunk when crc32(line) & mask == 0
+MANIFEST_HEADER = "conch-manifest 1"
+
+# Compression. The codec is picked by size and recorded in the index; the
+# hash is always taken over the uncompressed text, so addresses are stable.
+# "gzip" is zlib's DEFLATE with a gzip header, which gzip.open can stream.
+# Readers go by the magic bytes at the start of the file, not the index,
+# so any instance sharing the store can read what another one wrote. UTF-8
+# text never starts with either (0x8b and 0xfd are not lead bytes).
+COMPRESS_MIN = 1024
+LZMA_MIN = 1024 * 1024
+GZIP_MAGIC = b"\x1f\x8b"
+XZ_MAGIC = b"\xfd7zXZ\x00"
+
+# Garbage collection keeps pinned objects and anything newer than the
+# recency window, and deletes the rest GC_BATCH files at a time.
+GC_KEEP_SECONDS = 30 * 24 * 60 * 60
+GC_BATCH = 256
+
+# Recently read and written objects are kept in memory up to this many
+# bytes. Abbreviated hashes need at least MIN_PREFIX hex digits.
+CACHE_BYTES = 16 * 1024 * 1024
+MIN_PREFIX = 4
+
+# Only the first INDEX_CHARS characters of an object are full-text indexed,
+# so indexing what put_stream stores takes bounded memory.
+INDEX_CHARS = MAX_SIZE
+
+# put_stream accepts a text or binary file object, or an iterable of chunks.
+StreamSource = Union[IO[str], IO[bytes], Iterable[Union[str, bytes]]]
+
+# Statement text is kept in module constants so sqlite3's statement cache
+# hands back the same prepared statement on every call.
+_SQL_PIN = "INSERT OR IGNORE INTO pinned (hash) VALUES (?)"
+_SQL_ADD_OBJECT = (
+    "INSERT OR IGNORE INTO objects"
+    " (hash, size, created, kind, codec, stored_size, source, model)"
+    " VALUES (?, ?, ?, ?, ?, ?, ?, ?)"
+)
+_SQL_TOUCH = "UPDATE objects SET created = ? WHERE hash = ?"
+_SQL_ADD_DOCUMENT = "INSERT OR IGNORE INTO documents (hash) VALUES (?)"
+_SQL_UNINDEX_TEXT = (
+    "INSERT INTO text_index (text_index, rowid, body) VALUES ('delete', ?, ?)"
+)
+_SQL_INDEX_TEXT = (
+    "INSERT INTO text_index (rowid, body)" " SELECT id, ? FROM documents WHERE hash = ?"
+)
+_SQL_FIND = (
+    "SELECT o.hash, o.size, o.created, o.source, o.model"
+    " FROM text_index JOIN documents d ON d.id = text_index.rowid"
+    " JOIN objects o ON o.hash = d.hash"
+    " WHERE text_index MATCH ?{} ORDER BY text_index.rank LIMIT ?"
+)
+
+
+class _ReadCache:
+    """Thread-safe LRU of object texts, evicted by total memory use."""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._items: OrderedDict[str, str] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            value = self._items.get(key)
+            if value is not None:
+                self._items.move_to_end(key)
+            return value
+
+    def put(self, key: str, value: str) -> None:
+        cost = sys.getsizeof(value)
+        if cost > self.max_bytes // 4:
+            return  # one huge object should not flush everything else
+        with self._lock:
+            self._pop(key)
+            self._items[key] = value
+            self.size += cost
+            while self.size > self.max_bytes:
+                _, old = self._items.popitem(last=False)
+                self.size -= sys.getsizeof(old)
+
+    def discard(self, key: str) -> None:
+        with self._lock:
+            self._pop(key)
+
+    def _pop(self, key: str) -> None:
+        old = self._items.pop(key, None)
+        if old is not None:
+            self.size -= sys.getsizeof(old)
+
+
+class _KeepSet:
+    """The hashes gc must keep, refreshed with only what is new since.
+
+    Pinned objects, objects created since a time, and the chunks of any
+    manifest among them. Each refresh asks for the objects created or
+    pinned since the last one, so a manifest is read once per collection
+    rather than once per batch. A put whose row lands after the refresh
+    that should have seen it is still safe: its files have a new mtime,
+    which gc checks as well.
+    """
+
+    def __init__(self, cas: "CAS", since: float):
+        self._cas = cas
+        self._since = since
+        self.hashes: set[str] = set()
+
+    def __contains__(self, hash_: str) -> bool:
+        return hash_ in self.hashes
+
+    def refresh(self) -> None:
+        """Add what was created or pinned since the last refresh.
+
+        Call with the CAS lock held.
+        """
+        conn, since = self._cas._conn, self._since
+        self._since = time.time()
+        pinned = [row[0] for row in conn.execute("SELECT hash FROM pinned")]
+        # Manifests come from the index, which also knows the ones other
+        # instances sharing the store have written.
+        for hash_, kind in conn.execute(
+            "SELECT hash, kind FROM objects"
+            " WHERE created >= ? OR hash IN (SELECT hash FROM pinned)",
+            (since,),
+        ).fetchall():
+            if hash_ not in self.hashes:
+                self.hashes.add(hash_)
+                if kind == "manifest":
+                    self.hashes.update(self._cas._manifest_chunks(hash_))
+        self.hashes.update(pinned)
 
 
 class CAS:
-    def __init__(self, root: str):
+    def __init__(
+        self, root: str, compress: bool = True, cache_bytes: int = CACHE_BYTES
+    ):
         self.root = root
+        self.compress = compress
+        self._cache = _ReadCache(cache_bytes)
         self.store_dir = os.path.join(root, "store")
         self.db_path = os.path.join(root, "index.db")
         os.makedirs(self.store_dir, exist_ok=True)
+        self._fan_dirs: set[str] = set()
+        # One long-lived connection per store. It may be shared between
+        # threads, so every use goes through self._lock.
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(
+            self.db_path, check_same_thread=False, cached_statements=64
+        )
         self._init_db()
+        # Hashes known to be in the store, so puts can skip the stat, and
+        # the subset whose file is a chunk manifest rather than the text.
+        self._known: set[str] = set()
+        self._manifests: set[str] = set()
+        rows = self._conn.execute("SELECT hash, kind FROM objects")
+        for hash_, kind in rows:
+            self._known.add(hash_)
+            if kind == "manifest":
+                self._manifests.add(hash_)
 
     def _init_db(self):
-        conn = sqlite3.connect(self.db_path)
-        c = conn.cursor()
-        c.execute(
-            """CREATE TABLE IF NOT EXISTS pinned (
-            hash TEXT PRIMARY KEY
-        )"""
-        )
-        conn.commit()
-        conn.close()
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            with self._conn:
+                self._conn.execute(
+                    """CREATE TABLE IF NOT EXISTS pinned (
+                    hash TEXT PRIMARY KEY
+                )"""
+                )
+                self._conn.execute(
+                    """CREATE TABLE IF NOT EXISTS objects (
+                    hash TEXT PRIMARY KEY,
+                    size INTEGER NOT NULL,
+                    created REAL NOT NULL
+                )"""
+                )
+                self._ensure_columns(
+                    "objects",
+                    {
+                        "kind": "TEXT NOT NULL DEFAULT 'blob'",
+                        "codec": "TEXT",
+                        "stored_size": "INTEGER",
+                        "source": "TEXT",
+                        "model": "TEXT",
+                    },
+                )
+                # Full-text search: a contentless FTS5 table (the text lives
+                # in the store) keyed by the stable ids of ``documents``.
+                self._conn.execute(
+                    """CREATE TABLE IF NOT EXISTS documents (
+                    id INTEGER PRIMARY KEY,
+                    hash TEXT UNIQUE NOT NULL
+                )"""
+                )
+                try:
+                    self._conn.execute(
+                        "CREATE VIRTUAL TABLE IF NOT EXISTS text_index"
+                        " USING fts5(body, content='')"
+                    )
+                    self._fts = True
+                except sqlite3.OperationalError:
+                    # SQLite built without FTS5; find() falls back to a scan.
+                    self._fts = False
+
+    def _ensure_columns(self, table: str, columns: dict[str, str]) -> None:
+        """Add any of ``columns`` missing from an index created by an older
+        version."""
+        have = {row[1] for row in self._conn.execute(f"PRAGMA table_info({table})")}
+        for name, decl in columns.items():
+            if name not in have:
+                self._conn.execute(f"ALTER TABLE {table} ADD COLUMN {name} {decl}")
+
+    def close(self) -> None:
+        """Close the index connection. The instance is unusable afterwards."""
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def __enter__(self) -> "CAS":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
 
     def _hash_content(self, content: str) -> str:
         return hashlib.sha256(content.encode("utf-8")).hexdigest()
 
     def _get_path(self, hash_: str) -> str:
+        return os.path.join(self.store_dir, hash_[:2], hash_)
+
+    def _write_path(self, hash_: str) -> str:
+        """Like _get_path, but make sure the fan-out directory exists.
+
+        Each of the 256 directories is created at most once per instance;
+        reads never create anything.
+        """
         prefix = hash_[:2]
-        dir_path = os.path.join(self.store_dir, prefix)
-        os.makedirs(dir_path, exist_ok=True)
-        return os.path.join(dir_path, hash_)
-
-    def put(self, content: str) -> Optional[str]:
-        if not isinstance(content, str):
-            raise ValueError("Only plaintext is allowed")
-        if len(content.encode("utf-8")) > MAX_SIZE:
-            raise ValueError("Content too large (>4MB)")
-        hash_ = self._hash_content(content)
-        path = self._get_path(hash_)
-        if not os.path.exists(path):
-            with open(path, "w", encoding="utf-8") as f:
-                f.write(content)
+        if prefix not in self._fan_dirs:
+            os.makedirs(os.path.join(self.store_dir, prefix), exist_ok=True)
+            self._fan_dirs.add(prefix)
+        return os.path.join(self.store_dir, prefix, hash_)
+
+    def put(
+        self,
+        content: str,
+        source: Optional[str] = None,
+        model: Optional[str] = None,
+    ) -> Optional[str]:
+        return self.put_many([content], source=source, model=model)[0]
+
+    def put_many(
+        self,
+        contents: Iterable[str],
+        source: Optional[str] = None,
+        model: Optional[str] = None,
+    ) -> list[str]:
+        """Store several strings at once and return their hashes in order.
+
+        Everything is validated and hashed before anything is written.
+        Hashes already in the index are not written again, but their
+        ``created`` time and file mtime are refreshed so garbage collection
+        treats them as new; a file another instance collected is rewritten. The new ones are recorded, with
+        ``source``/``model`` metadata and in the full-text index, in the
+        same single transaction.
+        """
+        encoded = []
+        for content in contents:
+            if not isinstance(content, str):
+                raise ValueError("Only plaintext is allowed")
+            data = content.encode("utf-8")
+            if len(data) > MAX_SIZE:
+                raise ValueError("Content too large (>4MB)")
+            encoded.append((content, data))
+
+        hashes = []
+        new_rows: list[tuple] = []
+        texts: dict[str, str] = {}
+        now = time.time()
+        with self._lock:
+            for content, data in encoded:
+                if len(data) > CHUNK_THRESHOLD:
+                    hash_ = self._put_chunked(data, now, new_rows)
+                else:
+                    hash_ = self._put_blob(data, now, new_rows)
+                hashes.append(hash_)
+                texts[hash_] = content
+                self._cache.put(hash_, content)
+            rows = [
+                row + ((None, None) if row[3] == "chunk" else (source, model))
+                for row in new_rows
+            ]
+            with self._conn:
+                self._conn.executemany(_SQL_ADD_OBJECT, rows)
+                self._conn.executemany(_SQL_TOUCH, [(now, h) for h in hashes])
+                self._index_text(texts)
+        return hashes
+
+    def _touch_file(self, hash_: str, now: float) -> bool:
+        """Give a stored object's file a fresh mtime, as if just written.
+
+        Returns False if there is no file, which for a known hash means
+        another instance sharing the store has collected it since.
+        """
+        try:
+            os.utime(self._get_path(hash_), (now, now))
+        except FileNotFoundError:
+            self._known.discard(hash_)
+            self._manifests.discard(hash_)
+            return False
+        return True
+
+    def _index_text(self, texts: dict[str, str]) -> None:
+        """Add stored objects that are not yet in the full-text index.
+
+        The ``documents`` row decides: objects that already have one (put
+        earlier, or by another instance) are not indexed twice.
+        """
+        if not self._fts:
+            return
+        for hash_, text in texts.items():
+            if self._conn.execute(_SQL_ADD_DOCUMENT, (hash_,)).rowcount:
+                self._conn.execute(_SQL_INDEX_TEXT, (text[:INDEX_CHARS], hash_))
+
+    def _unindex_text(self, docs: list[tuple[int, str]]) -> None:
+        """Remove ``(id, hash)`` documents from the full-text index.
+
+        The index is contentless, so FTS5 needs the indexed text back to
+        delete a row; it is read from the store, which is why this runs
+        before garbage collection removes any files.
+        """
+        for id_, hash_ in docs:
+            text = self._index_prefix(hash_) if self._fts else None
+            if text is not None:
+                self._conn.execute(_SQL_UNINDEX_TEXT, (id_, text))
+            self._conn.execute("DELETE FROM documents WHERE id = ?", (id_,))
+
+    def _index_prefix(self, hash_: str) -> Optional[str]:
+        """The part of an object's text that _index_text indexed."""
+        try:
+            with self.open(hash_) as f:
+                return f.read(INDEX_CHARS)
+        except FileNotFoundError:
+            return None
+
+    def _put_blob(
+        self, data: bytes, now: float, rows: list[tuple], kind: str = "blob"
+    ) -> str:
+        """Write ``data`` as a single object unless it is already stored."""
+        hash_ = hashlib.sha256(data).hexdigest()
+        if self._touch_file(hash_, now):
+            if hash_ in self._known:
+                return hash_
+            codec, stored = None, None  # written by another instance
+        else:
+            codec, payload = self._encode(data)
+            with open(self._write_path(hash_), "wb") as f:
+                f.write(payload)
+            stored = len(payload)
+        self._known.add(hash_)
+        rows.append((hash_, len(data), now, kind, codec, stored))
+        return hash_
+
+    def _encode(self, data: bytes) -> tuple[Optional[str], bytes]:
+        """Compress ``data`` with the codec for its size, if that pays off."""
+        if not self.compress or len(data) < COMPRESS_MIN:
+            return None, data
+        if len(data) >= LZMA_MIN:
+            codec, payload = "lzma", lzma.compress(data)
+        else:
+            codec, payload = "gzip", gzip.compress(data, mtime=0)
+        if len(payload) >= len(data):
+            return None, data
+        return codec, payload
+
+    def _read_bytes(self, path: str) -> bytes:
+        with open(path, "rb") as f:
+            data = f.read()
+        if data.startswith(GZIP_MAGIC):
+            return gzip.decompress(data)
+        if data.startswith(XZ_MAGIC):
+            return lzma.decompress(data)
+        return data
+
+    def _put_chunked(self, data: bytes, now: float, rows: list[tuple]) -> str:
+        """Store ``data`` as chunk objects plus a manifest at its own hash."""
+        hash_ = hashlib.sha256(data).hexdigest()
+        if hash_ in self._known and self._touch_file(hash_, now):
+            return hash_
+        chunk_hashes = [
+            self._put_blob(c, now, rows, kind="chunk") for c in split_chunks(data)
+        ]
+        manifest = ("\n".join([MANIFEST_HEADER, *chunk_hashes]) + "\n").encode()
+        with open(self._write_path(hash_), "wb") as f:
+            f.write(manifest)
+        self._known.add(hash_)
+        self._manifests.add(hash_)
+        rows.append((hash_, len(data), now, "manifest", None, len(manifest)))
         return hash_
 
+    def put_stream(
+        self,
+        stream: StreamSource,
+        source: Optional[str] = None,
+        model: Optional[str] = None,
+    ) -> str:
+        """Store text read incrementally from ``stream`` and return its hash.
+
+        The content is hashed while it is copied into a temporary file in
+        the store, which is then renamed into place, so memory use stays
+        bounded and there is no size limit. Byte chunks must be UTF-8.
+        With compression on, the file is gzip-compressed on the fly.
+        ``source``/``model`` are recorded and the text is indexed as for
+        put_many, up to INDEX_CHARS characters.
+        """
+        codec = "gzip" if self.compress else None
+        decoder = codecs.getincrementaldecoder("utf-8")()
+        hasher = hashlib.sha256()
+        size = 0
+        head: list[str] = []  # the start of the text, for the full-text index
+        head_chars = 0
+        fd, tmp_path = tempfile.mkstemp(dir=self.store_dir, prefix=".put-")
+        try:
+            with os.fdopen(fd, "wb") as raw:
+                tmp = gzip.GzipFile(fileobj=raw, mode="wb", mtime=0) if codec else raw
+                for chunk in _iter_source(stream):
+                    if isinstance(chunk, str):
+                        data, text = chunk.encode("utf-8"), chunk
+                    elif isinstance(chunk, (bytes, bytearray)):
+                        data = bytes(chunk)
+                        try:
+                            text = decoder.decode(data)
+                        except UnicodeDecodeError:
+                            raise ValueError("Only plaintext is allowed")
+                    else:
+                        raise ValueError("Only plaintext is allowed")
+                    if head_chars < INDEX_CHARS:
+                        head.append(text)
+                        head_chars += len(text)
+                    hasher.update(data)
+                    tmp.write(data)
+                    size += len(data)
+                if codec:
+                    tmp.close()
+            try:
+                decoder.decode(b"", final=True)
+            except UnicodeDecodeError:
+                raise ValueError("Only plaintext is allowed")
+            hash_ = hasher.hexdigest()
+            now = time.time()
+            with self._lock:
+                if self._touch_file(hash_, now):
+                    os.remove(tmp_path)
+                    codec = stored = None
+                else:
+                    stored = os.path.getsize(tmp_path)
+                    os.replace(tmp_path, self._write_path(hash_))
+                self._known.add(hash_)
+                row = (hash_, size, now, "blob", codec, stored, source, model)
+                with self._conn:
+                    self._conn.execute(_SQL_ADD_OBJECT, row)
+                    self._conn.execute(_SQL_TOUCH, (now, hash_))
+                    self._index_text({hash_: "".join(head)})
+            return hash_
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def resolve(self, prefix: str) -> Optional[str]:
+        """Expand an abbreviated hash, git-style.
+
+        Returns the full hash, or None if nothing matches. Raises
+        ValueError if the prefix is too short, not hex, or ambiguous.
+        """
+        prefix = prefix.lower()
+        if len(prefix) == 64:
+            return prefix
+        if len(prefix) < MIN_PREFIX or len(prefix) > 64:
+            raise ValueError(f"Hash prefix must be {MIN_PREFIX}-64 hex digits")
+        if prefix.strip("0123456789abcdef"):
+            raise ValueError(f"Not a hex hash prefix: {prefix}")
+        with self._lock:
+            matches = [
+                row[0]
+                for row in self._conn.execute(
+                    "SELECT hash FROM objects WHERE hash >= ? AND hash < ? LIMIT 2",
+                    (prefix, prefix + "g"),
+                )
+            ]
+        if not matches:
+            # Objects stored before the index existed are only on disk.
+            fan = os.path.join(self.store_dir, prefix[:2])
+            if os.path.isdir(fan):
+                matches = [n for n in os.listdir(fan) if n.startswith(prefix)][:2]
+        if len(matches) > 1:
+            raise ValueError(f"Ambiguous hash prefix: {prefix}")
+        return matches[0] if matches else None
+
     def get(self, hash_: str) -> Optional[str]:
+        """Return an object's text, or None. Accepts abbreviated hashes."""
+        if len(hash_) < 64:
+            hash_ = self.resolve(hash_)
+            if hash_ is None:
+                return None
+        content = self._cache.get(hash_)
+        if content is None:
+            content = self._load(hash_)
+            if content is not None:
+                self._cache.put(hash_, content)
+        return content
+
+    def _is_manifest(self, hash_: str) -> bool:
+        """Whether the file for ``hash_`` is a chunk manifest.
+
+        Hashes this instance has not seen may have been written by another
+        one sharing the store, so they are looked up in the index.
+        """
+        if hash_ in self._manifests:
+            return True
+        if hash_ in self._known:
+            return False
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT kind FROM objects WHERE hash = ?", (hash_,)
+            ).fetchone()
+            if row is None:
+                return False
+            self._known.add(hash_)
+            if row[0] == "manifest":
+                self._manifests.add(hash_)
+        return row[0] == "manifest"
+
+    def _load(self, hash_: str) -> Optional[str]:
         path = self._get_path(hash_)
-        if not os.path.exists(path):
+        try:
+            if not self._is_manifest(hash_):
+                return self._read_bytes(path).decode("utf-8")
+            with open(path, "rb") as f:
+                chunk_hashes = _parse_manifest(f.read().decode("utf-8"))
+        except FileNotFoundError:
+            return None
+        chunks = [self._load(c) for c in chunk_hashes]
+        if any(c is None for c in chunks):
             return None
-        with open(path, "r", encoding="utf-8") as f:
-            return f.read()
+        return "".join(chunks)
+
+    def open(self, hash_: str) -> IO[str]:
+        """Open a stored object for reading as text.
+
+        Raises FileNotFoundError if the hash is not in the store.
+        """
+        if len(hash_) < 64:
+            hash_ = self.resolve(hash_) or hash_
+        if self._is_manifest(hash_) or self._cache.get(hash_) is not None:
+            content = self.get(hash_)
+            if content is None:
+                raise FileNotFoundError(hash_)
+            return io.StringIO(content, newline="")
+        path = self._get_path(hash_)
+        with open(path, "rb") as f:
+            magic = f.read(len(XZ_MAGIC))
+        if magic.startswith(GZIP_MAGIC):
+            return gzip.open(path, "rt", encoding="utf-8", newline="")
+        if magic.startswith(XZ_MAGIC):
+            return lzma.open(path, "rt", encoding="utf-8", newline="")
+        return open(path, "r", encoding="utf-8", newline="")
+
+    def iter_chunks(self, hash_: str, size: int = STREAM_CHUNK) -> Iterator[str]:
+        """Yield a stored object as text chunks of at most ``size`` chars."""
+        with self.open(hash_) as f:
+            while True:
+                chunk = f.read(size)
+                if not chunk:
+                    return
+                yield chunk
+
+    def get_many(self, hashes: Iterable[str]) -> list[Optional[str]]:
+        """Fetch several objects; missing hashes come back as None."""
+        cache: dict[str, Optional[str]] = {}
+        result = []
+        for hash_ in hashes:
+            if hash_ not in cache:
+                cache[hash_] = self.get(hash_)
+            result.append(cache[hash_])
+        return result
+
+    def find(
+        self,
+        query: str,
+        limit: int = 20,
+        sources: Optional[Iterable[str]] = None,
+    ) -> list[dict]:
+        """Search stored text; return metadata dicts, best matches first.
+
+        Every word in ``query`` must appear (case-insensitively). Words are
+        quoted before reaching FTS5, so punctuation is taken literally.
+        With ``sources``, only objects saved with one of them are returned.
+        """
+        words = query.split()
+        if not words:
+            return []
+        cols = ("hash", "size", "created", "source", "model")
+        only, args = "", []
+        if sources is not None:
+            args = list(sources)
+            only = " AND o.source IN ({})".format(", ".join("?" * len(args)))
+        if self._fts:
+            match = " ".join('"' + w.replace('"', '""') + '"' for w in words)
+            with self._lock:
+                rows = self._conn.execute(
+                    _SQL_FIND.format(only), (match, *args, limit)
+                ).fetchall()
+            return [dict(zip(cols, row)) for row in rows]
+        # No FTS5: scan every object, newest first.
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT hash, size, created, source, model FROM objects o"
+                f" WHERE kind != 'chunk'{only} ORDER BY created DESC",
+                args,
+            ).fetchall()
+        found = []
+        lowered = [w.lower() for w in words]
+        for row in rows:
+            text = (self.get(row[0]) or "").lower()
+            if all(w in text for w in lowered):
+                found.append(dict(zip(cols, row)))
+                if len(found) >= limit:
+                    break
+        return found
+
+    def stats(self) -> dict[str, int]:
+        """Summarise the store: object count, logical bytes, bytes on disk.
+
+        Chunks are counted towards disk use but not as objects, so the
+        difference between ``size`` and ``stored`` is what chunk sharing
+        and compression saved together.
+        """
+        with self._lock:
+            objects, size = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM objects"
+                " WHERE kind != 'chunk'"
+            ).fetchone()
+            (stored,) = self._conn.execute(
+                "SELECT COALESCE(SUM(COALESCE(stored_size, size)), 0) FROM objects"
+            ).fetchone()
+        return {"objects": objects, "size": size, "stored": stored}
 
     def pin(self, hash_: str):
-        conn = sqlite3.connect(self.db_path)
-        c = conn.cursor()
-        c.execute("INSERT OR IGNORE INTO pinned (hash) VALUES (?)", (hash_,))
-        conn.commit()
-        conn.close()
+        with self._lock, self._conn:
+            self._conn.execute(_SQL_PIN, (hash_,))
+
+    def unpin(self, hash_: str):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM pinned WHERE hash = ?", (hash_,))
+
+    def _manifest_chunks(self, hash_: str) -> list[str]:
+        try:
+            with open(self._get_path(hash_), "rb") as f:
+                return _parse_manifest(f.read().decode("utf-8"))
+        except (OSError, ValueError):
+            return []
+
+    def gc_batches(
+        self, keep_seconds: float = GC_KEEP_SECONDS, batch_size: int = GC_BATCH
+    ) -> Iterator[tuple[int, int]]:
+        """Delete unpinned objects older than ``keep_seconds``, in batches.
+
+        Yields ``(removed, freed_bytes)`` after each batch so a caller can
+        spread the work out. The lock is only held while a batch is being
+        deleted, and the keep set is refreshed each time with what was put
+        or pinned since, so those objects are never removed.
+        """
+        cutoff = time.time() - keep_seconds
+        live = _KeepSet(self, cutoff)
+        with self._lock:
+            live.refresh()
+            rows = self._conn.execute(
+                "SELECT d.id, d.hash FROM documents d"
+                " JOIN objects o ON o.hash = d.hash WHERE o.created < ?",
+                (cutoff,),
+            ).fetchall()
+        # Files are checked without the lock; each batch looks again.
+        doomed = [
+            (id_, hash_)
+            for id_, hash_ in rows
+            if hash_ not in live and self._mtime(hash_) < cutoff
+        ]
+        # Searchable objects leave the text index first, while every chunk
+        # of their text can still be read.
+        for start in range(0, len(doomed), batch_size):
+            with self._lock, self._conn:
+                live.refresh()
+                batch = doomed[start : start + batch_size]
+                self._unindex_text([d for d in batch if d[1] not in live])
+            yield 0, 0
+        candidates: list[os.DirEntry] = []
+        with os.scandir(self.store_dir) as fans:
+            for fan in fans:
+                if fan.is_dir():
+                    with os.scandir(fan.path) as entries:
+                        candidates.extend(entries)
+                elif fan.name.startswith(".put-"):
+                    candidates.append(fan)  # left by an interrupted put_stream
+                while len(candidates) >= batch_size:
+                    batch = candidates[:batch_size]
+                    candidates = candidates[batch_size:]
+                    yield self._gc_batch(batch, live, cutoff)
+        if candidates:
+            yield self._gc_batch(candidates, live, cutoff)
+
+    def _mtime(self, hash_: str) -> float:
+        try:
+            return os.stat(self._get_path(hash_)).st_mtime
+        except FileNotFoundError:
+            return 0.0
+
+    def _gc_batch(
+        self, entries: list[os.DirEntry], live: _KeepSet, cutoff: float
+    ) -> tuple[int, int]:
+        removed, freed, rows = 0, 0, []
+        with self._lock:
+            live.refresh()
+            for entry in entries:
+                if entry.name in live:
+                    continue
+                try:
+                    st = entry.stat()
+                    if st.st_mtime >= cutoff:
+                        continue
+                    os.remove(entry.path)
+                except FileNotFoundError:
+                    continue
+                removed += 1
+                freed += st.st_size
+                rows.append((entry.name,))
+                self._known.discard(entry.name)
+                self._manifests.discard(entry.name)
+                self._cache.discard(entry.name)
+            if rows:
+                with self._conn:
+                    self._conn.executemany("DELETE FROM objects WHERE hash = ?", rows)
+                    self._conn.executemany("DELETE FROM documents WHERE hash = ?", rows)
+        return removed, freed
+
+    def gc(
+        self, keep_seconds: float = GC_KEEP_SECONDS, batch_size: int = GC_BATCH
+    ) -> tuple[int, int]:
+        """Run gc_batches to completion; return ``(removed, freed_bytes)``."""
+        removed = freed = 0
+        for n, size in self.gc_batches(keep_seconds, batch_size):
+            removed += n
+            freed += size
+        return removed, freed
+
+
+class AsyncCAS:
+    """Queue CAS writes on a background thread, away from the event loop.
+
+    Writes run one at a time in submission order. ``submit`` returns a
+    ``concurrent.futures.Future`` for fire-and-forget callers; ``put`` is
+    the awaitable form. ``close`` waits for the queue to drain.
+    """
+
+    def __init__(self, cas: CAS):
+        self.cas = cas
+        self._executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="cas-writer"
+        )
+        self._pending: set[Future] = set()
+
+    def submit(
+        self,
+        content: str,
+        source: Optional[str] = None,
+        model: Optional[str] = None,
+    ) -> Future:
+        fut = self._executor.submit(self.cas.put, content, source, model)
+        self._pending.add(fut)
+        fut.add_done_callback(self._pending.discard)
+        return fut
+
+    def submit_stream(
+        self,
+        stream: StreamSource,
+        source: Optional[str] = None,
+        model: Optional[str] = None,
+    ) -> Future:
+        """Queue a put_stream; ``stream`` is read on the writer thread."""
+        fut = self._executor.submit(self.cas.put_stream, stream, source, model)
+        self._pending.add(fut)
+        fut.add_done_callback(self._pending.discard)
+        return fut
+
+    async def put(
+        self,
+        content: str,
+        source: Optional[str] = None,
+        model: Optional[str] = None,
+    ) -> str:
+        return await asyncio.wrap_future(self.submit(content, source, model))
+
+    def flush(self, timeout: Optional[float] = None) -> None:
+        """Block until every write submitted so far has finished."""
+        wait(list(self._pending), timeout=timeout)
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=True)
+        self._pending.clear()
+
+
+def _iter_source(source: StreamSource) -> Iterator[Union[str, bytes]]:
+    """Normalise a put_stream source into an iterator of chunks."""
+    read = getattr(source, "read", None)
+    if read is None:
+        yield from source
+        return
+    while True:
+        chunk = read(STREAM_CHUNK)
+        if not chunk:
+            return
+        yield chunk
+
+
+def split_chunks(data: bytes) -> list[bytes]:
+    """Split UTF-8 ``data`` into content-defined chunks.
+
+    A chunk ends after a line whose CRC matches CHUNK_MASK once it holds at
+    least MIN_CHUNK bytes, so boundaries depend only on nearby lines and
+    re-synchronise right after an edit. Overlong lines are cut at
+    MAX_CHUNK, backing off to a character boundary.
+    """
+    chunks = []
+    current: list[bytes] = []
+    size = 0
+    for line in data.splitlines(keepends=True):
+        while size + len(line) > MAX_CHUNK:
+            cut = MAX_CHUNK - size
+            while cut > 0 and 0x80 <= line[cut] < 0xC0:
+                cut -= 1
+            current.append(line[:cut])
+            chunks.append(b"".join(current))
+            current, size, line = [], 0, line[cut:]
+        current.append(line)
+        size += len(line)
+        if size >= MIN_CHUNK and zlib.crc32(line) & CHUNK_MASK == 0:
+            chunks.append(b"".join(current))
+            current, size = [], 0
+    if current:
+        chunks.append(b"".join(current))
+    return chunks
+
+
+def _parse_manifest(text: str) -> list[str]:
+    lines = text.splitlines()
+    if not lines or lines[0] != MANIFEST_HEADER:
+        raise ValueError("Not a CAS manifest")
+    return lines[1:]
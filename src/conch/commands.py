@@ -1,6 +1,32 @@
+import asyncio
+import codecs
 import os
+import shlex
+import threading
+import time
 import pyperclip
-from .cas import CAS
+from concurrent.futures import Future
+from typing import Iterator
+from .cas import CAS, GC_KEEP_SECONDS, AsyncCAS
+from .fileindex import FileIndex
+from .files import format_entries, scan_folder
+from .jobs import Job
+
+# Lines of log kept in memory before older ones spill to CAS.
+SCROLLBACK_LINES = 100_000
+# Sam edits between buffer checkpoints written to CAS (0: no checkpoints).
+UNDO_CHECKPOINT_EDITS = 0
+# Directory entries shown at a time; :more shows the next page.
+FOLDER_PAGE = 1000
+# Seconds a shell command may run before it is killed (0: no limit).
+SHELL_TIMEOUT = 0
+# Bytes of shell output read (and written to the log) at a time.
+SHELL_CHUNK = 64 * 1024
+# Lines joined into each chunk when the log or a job is streamed to CAS.
+SAVE_CHUNK_LINES = 4096
+# CAS sources :find searches: AI responses, :w and :jobw snapshots (not
+# scrollback pages or undo checkpoints).
+FIND_SOURCES = ("ai", ":w", "job")
 
 # Sample LOREM text for /lorem command
 LOREM = [
@@ -58,34 +84,552 @@ def command_select(app, sel):
     return False
 
 
-def save_to_cas(s: str) -> str:
-    cas_root = os.environ.get("CONCH_CAS_ROOT")
-    if cas_root is None:
+# Process-wide CAS instances, keyed by root directory.
+_cas_instances: dict[str, CAS] = {}
+_async_instances: dict[str, AsyncCAS] = {}
+_cas_lock = threading.Lock()
+
+
+def cas_root() -> str:
+    """Return the CAS root: $CONCH_CAS_ROOT or ~/.conch/cas."""
+    root = os.environ.get("CONCH_CAS_ROOT")
+    if root is None:
         home = os.environ.get("HOME") or os.path.expanduser("~")
-        cas_root = os.path.join(home, ".conch", "cas")
-    os.makedirs(cas_root, exist_ok=True)
-    cas = CAS(cas_root)
-    return cas.put(s)
+        root = os.path.join(home, ".conch", "cas")
+    return root
 
 
-def command_w(app):
-    buffer_content = "\n".join(
-        [getattr(line, "text", str(line)) for line in app.log_view.lines]
+def get_cas() -> CAS:
+    """Return the shared CAS for the current root, opening it on first use."""
+    root = cas_root()
+    cas = _cas_instances.get(root)
+    if cas is None:
+        with _cas_lock:
+            cas = _cas_instances.get(root)
+            if cas is None:
+                os.makedirs(root, exist_ok=True)
+                cas = CAS(root)
+                _cas_instances[root] = cas
+    return cas
+
+
+def get_async_cas() -> AsyncCAS:
+    """Return the shared background writer for the current root."""
+    cas = get_cas()
+    with _cas_lock:
+        writer = _async_instances.get(cas.root)
+        if writer is None:
+            writer = _async_instances[cas.root] = AsyncCAS(cas)
+    return writer
+
+
+def close_cas() -> None:
+    """Flush pending writes, then close and forget every shared CAS."""
+    with _cas_lock:
+        for writer in _async_instances.values():
+            writer.close()
+        _async_instances.clear()
+        for cas in _cas_instances.values():
+            cas.close()
+        _cas_instances.clear()
+
+
+def scrollback_limit() -> int | None:
+    """Return $CONCH_SCROLLBACK (lines kept in memory), or None for no cap."""
+    value = os.environ.get("CONCH_SCROLLBACK")
+    if value is None:
+        return SCROLLBACK_LINES
+    try:
+        limit = int(value)
+    except ValueError:
+        return SCROLLBACK_LINES
+    return limit if limit > 0 else None
+
+
+def undo_checkpoint_every() -> int:
+    """Return $CONCH_UNDO_CHECKPOINT: sam edits between CAS checkpoints."""
+    try:
+        return max(int(os.environ.get("CONCH_UNDO_CHECKPOINT", "")), 0)
+    except ValueError:
+        return UNDO_CHECKPOINT_EDITS
+
+
+def shell_timeout() -> float | None:
+    """Return $CONCH_SHELL_TIMEOUT in seconds, or None for no limit."""
+    try:
+        seconds = float(os.environ.get("CONCH_SHELL_TIMEOUT", ""))
+    except ValueError:
+        seconds = SHELL_TIMEOUT
+    return seconds if seconds > 0 else None
+
+
+async def run_shell(
+    app, command: str, timeout: float | None = None, job: Job | None = None
+) -> int | None:
+    """Run ``command`` without a shell, streaming its output into the log.
+
+    stdout and stderr are merged so their lines keep their order. Output is
+    read a chunk at a time and each chunk's lines are added in one go, so
+    the UI keeps running however much is printed. With a ``job`` the
+    output goes to the job's buffer instead, and only its end is logged.
+    Returns the exit code, or None if the command could not start, timed
+    out or was cancelled.
+    """
+    if job is not None:
+        write = job.write
+    else:
+
+        def write(lines):
+            app.log_view.extend("  " + ln for ln in lines)
+
+    try:
+        proc = await asyncio.create_subprocess_exec(
+            *shlex.split(command),
+            stdin=asyncio.subprocess.DEVNULL,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.STDOUT,
+        )
+    except Exception as e:
+        _shell_done(app, job, write, f"[error] {e}", f"failed: {e}")
+        return None
+    app.busy_indicator.update(_shell_status(app) if job else f":run {command}")
+    decoder = codecs.getincrementaldecoder("utf-8")("replace")
+    pending = ""
+    wrote = False
+    try:
+        async with asyncio.timeout(timeout):
+            while chunk := await proc.stdout.read(SHELL_CHUNK):
+                *lines, pending = (pending + decoder.decode(chunk)).split("\n")
+                if lines:
+                    write(lines)
+                    wrote = True
+            code = await proc.wait()
+    except (TimeoutError, asyncio.CancelledError) as e:
+        if proc.returncode is None:
+            proc.kill()
+        await asyncio.shield(proc.wait())
+        if pending:
+            write([pending])
+        cancelled = isinstance(e, asyncio.CancelledError)
+        reason = "cancelled" if cancelled else "timed out"
+        _shell_done(app, job, write, f"[{reason}] {command}", reason)
+        if cancelled:
+            raise
+        return None
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        write([pending])
+    message = f"(exit {code})" if code or not (wrote or pending) else None
+    _shell_done(app, job, write, message, f"exit {code}", code)
+    return code
+
+
+def _shell_status(app) -> str:
+    jobs = getattr(app, "jobs", None)
+    return jobs.status() if jobs is not None else ":idle"
+
+
+def _shell_done(app, job, write, message, state, code=None) -> None:
+    """Report how a command ended: in its output, or for a job, in the log."""
+    if job is None:
+        if message:
+            write([message])
+    else:
+        job.finish(state, code)
+        app.log_view.append(job.describe())
+    app.busy_indicator.update(_shell_status(app))
+
+
+def start_job(app, command: str) -> Job:
+    """Run ``command`` as a background job with its own output buffer."""
+    job = app.jobs.add(command)
+    job.task = asyncio.get_running_loop().create_task(
+        run_shell(app, command, shell_timeout(), job)
     )
-    hash_value = save_to_cas(buffer_content)
+    app.log_view.append(f"[{job.number}] started {command}")
+    app.busy_indicator.update(_shell_status(app))
+    return job
+
+
+def _job_arg(app, cmd_line: str):
+    """The job named by the argument of :fg/:kill/:jobw (default: newest)."""
+    parts = cmd_line.split()
+    try:
+        number = int(parts[1].lstrip("%")) if len(parts) > 1 else None
+    except ValueError:
+        number = -1
+    job = app.jobs.get(number)
+    if job is None:
+        app.log_view.append(f"No such job: {' '.join(parts[1:]) or '(none yet)'}")
+    app.input.value = ""
+    return job
+
+
+def command_jobs(app):
+    """List background jobs and their state."""
+    jobs = list(app.jobs)
+    if not jobs:
+        app.log_view.append("No jobs")
+    for job in jobs:
+        app.log_view.append(f"{job.describe()}  ({len(job.output)} lines)")
+    app.input.value = ""
+
+
+def command_fg(app, cmd_line):
+    """
+    Show a job's output in the log and keep following it while it runs.
+
+    Usage:
+      :fg [N]    job N (default: the newest)
+    """
+    job = _job_arg(app, cmd_line)
+    if job is None:
+        return None
+    for other in app.jobs:
+        other.follow = None
+    log = app.log_view
+    log.append(f"# {job.describe()}")
+    if job.dropped:
+        log.append(f"  ... {job.dropped:,} earlier lines dropped")
+    log.extend("  " + ln for ln in job.output)
+    if job.running:
+        job.follow = lambda lines: log.extend("  " + ln for ln in lines)
+    return job
+
+
+def command_kill(app, cmd_line):
+    """
+    Stop a running job.
+
+    Usage:
+      :kill [N]  job N (default: the newest)
+    """
+    job = _job_arg(app, cmd_line)
+    if job is None:
+        return None
+    if job.running and job.task is not None:
+        job.task.cancel()
+    else:
+        app.log_view.append(job.describe())
+    return job
+
+
+def command_jobw(app, cmd_line):
+    """
+    Save a job's output buffer to CAS, like :w does for the log.
+
+    Usage:
+      :jobw [N]  job N (default: the newest)
+    """
+    job = _job_arg(app, cmd_line)
+    if job is None:
+        return None
+    # Copy the line references now; the job may keep writing meanwhile.
+    stream = _text_chunks(list(job.output))
+    fut = asyncio.wrap_future(get_async_cas().submit_stream(stream, source="job"))
+    app.busy_indicator.update("Saving...")
+
+    def done(f):
+        try:
+            app.busy_indicator.update(f"Saved: {f.result()}")
+        except Exception as e:
+            app.busy_indicator.update(f"[error] Failed to save to CAS: {e}")
+
+    fut.add_done_callback(done)
+    return fut
+
+
+def checkpoint_to_cas(text: str) -> Future:
+    """Queue an undo checkpoint of the sam buffer for the CAS writer."""
+    return get_async_cas().submit(text, source="undo")
+
+
+class CASPager:
+    """Spill LogView scrollback pages to the shared CAS and read them back.
+
+    Pages are written on the CAS writer thread; the handle is the write's
+    Future, so reading a page back waits for its write if still queued.
+    Spilled pages are pinned so :gc (from this or another session) leaves
+    them alone, and unpinned when released or when the pager is closed.
+    Pages go through put_stream, so a page of long lines is never refused
+    for being over MAX_SIZE.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pins: dict[str, int] = {}  # hash -> pages holding it
+        self._spilled = False
+
+    def spill(self, text: str) -> Future:
+        self._spilled = True
+        fut = get_async_cas().submit_stream([text], source="scrollback")
+        fut.add_done_callback(self._pin)
+        return fut
+
+    def load(self, handle: Future) -> str:
+        try:
+            hash_value = handle.result()
+        except Exception as e:
+            raise LookupError(f"scrollback page could not be saved: {e}") from e
+        text = get_cas().get(hash_value)
+        if text is None:
+            raise LookupError(f"scrollback page {hash_value} is missing from CAS")
+        return text
+
+    def release(self, handles: list[Future]) -> None:
+        # Callbacks run in order, so a page still being written is pinned
+        # first and unpinned right after.
+        for handle in handles:
+            handle.add_done_callback(self._unpin)
+
+    def close(self) -> None:
+        """Unpin every page still held, e.g. when the app exits."""
+        if not self._spilled:
+            return  # don't open (and create) the CAS just to find no pins
+        get_async_cas().flush()  # let queued spills pin their pages first
+        with self._lock:
+            hashes, self._pins = list(self._pins), {}
+        for hash_value in hashes:
+            get_cas().unpin(hash_value)
+
+    def _pin(self, handle: Future) -> None:
+        if handle.exception() is not None:
+            return
+        hash_value = handle.result()
+        with self._lock:
+            count = self._pins.get(hash_value, 0)
+            self._pins[hash_value] = count + 1
+        if not count:
+            get_cas().pin(hash_value)
+
+    def _unpin(self, handle: Future) -> None:
+        if handle.exception() is not None:
+            return
+        hash_value = handle.result()
+        with self._lock:
+            count = self._pins.get(hash_value, 0) - 1
+            if count > 0:
+                self._pins[hash_value] = count
+                return
+            if count < 0:
+                return  # already released by close()
+            del self._pins[hash_value]
+        get_cas().unpin(hash_value)
+
+
+def save_to_cas(s: str, source: str | None = None, model: str | None = None) -> str:
+    return get_cas().put(s, source=source, model=model)
+
+
+async def save_to_cas_async(
+    s: str, source: str | None = None, model: str | None = None
+) -> str:
+    """Like save_to_cas, but the write happens on the CAS writer thread."""
+    return await get_async_cas().put(s, source=source, model=model)
+
+
+def _text_chunks(lines) -> Iterator[str]:
+    """``lines`` joined with newlines, SAVE_CHUNK_LINES lines at a time."""
+    for start in range(0, len(lines), SAVE_CHUNK_LINES):
+        chunk = "\n".join(lines[start : start + SAVE_CHUNK_LINES])
+        yield "\n" + chunk if start else chunk
+
+
+def _log_stream(app) -> Iterator[str]:
+    """The log as it is now, for put_stream, which has no size cap.
+
+    A snapshot is taken first, so lines written while the chunks are
+    being stored do not end up in the saved text.
+    """
+    return _text_chunks(app.log_view.snapshot())
+
+
+def command_w(app):
+    hash_value = get_cas().put_stream(_log_stream(app), source=":w")
     app.busy_indicator.update(f"Saved: {hash_value}")
     app.input.value = ""
 
 
+def command_w_background(app):
+    """:w for the running TUI: queue the write and report when it lands."""
+    fut = asyncio.wrap_future(
+        get_async_cas().submit_stream(_log_stream(app), source=":w")
+    )
+    app.busy_indicator.update("Saving...")
+    app.input.value = ""
+
+    def done(f):
+        try:
+            app.busy_indicator.update(f"Saved: {f.result()}")
+        except Exception as e:
+            app.busy_indicator.update(f"[error] Failed to save to CAS: {e}")
+
+    fut.add_done_callback(done)
+    return fut
+
+
+def command_cas(app):
+    """Report CAS size and how much chunking/compression saved."""
+    st = get_cas().stats()
+    size, stored = st["size"], st["stored"]
+    saved = 100 * (size - stored) / size if size else 0
+    app.log_view.append(
+        f"[cas] {st['objects']} objects, {size:,} bytes"
+        f" stored in {stored:,} ({saved:.0f}% saved)"
+    )
+    app.input.value = ""
+
+
+async def run_gc(app, keep_seconds: float) -> tuple[int, int]:
+    """Collect CAS garbage one batch at a time on a worker thread."""
+    batches = get_cas().gc_batches(keep_seconds)
+    removed = freed = 0
+    while True:
+        step = await asyncio.to_thread(next, batches, None)
+        if step is None:
+            break
+        removed += step[0]
+        freed += step[1]
+        app.busy_indicator.update(f":gc {removed} removed")
+    app.log_view.append(f"[gc] removed {removed} objects, freed {freed:,} bytes")
+    app.busy_indicator.update(":idle")
+    return removed, freed
+
+
+async def run_index(app, mapped) -> int:
+    """Index a file shown by the log view a chunk at a time on a worker thread."""
+    name = os.path.basename(mapped.path)
+    steps = mapped.index_steps()
+    while await asyncio.to_thread(next, steps, None) is not None:
+        app.log_view.file_grew()
+        app.busy_indicator.update(f"Loading {name}: {mapped.progress:.0%}")
+    if not mapped.stopped:
+        app.log_view.file_grew()
+        app.log_view.append("§§§")
+    app.busy_indicator.update(":idle")
+    return len(mapped)
+
+
+def command_gc(app, cmd_line):
+    """
+    Start CAS garbage collection in the background.
+
+    Usage:
+      :gc        keep pinned objects and the last 30 days
+      :gc 7      keep pinned objects and the last 7 days
+    """
+    parts = cmd_line.split()
+    days = GC_KEEP_SECONDS / 86400
+    if len(parts) > 1:
+        try:
+            days = float(parts[1])
+        except ValueError:
+            app.log_view.append(f"Invalid gc window: {parts[1]}")
+            app.input.value = ""
+            return None
+    app.log_view.append(f"[gc] removing unpinned objects older than {days:g} days")
+    app.gc_task = asyncio.get_running_loop().create_task(run_gc(app, days * 86400))
+    app.input.value = ""
+    return app.gc_task
+
+
+def command_find(app, cmd_line):
+    """
+    Search text saved in CAS (AI responses and :w snapshots).
+
+    Usage:
+      :find sqlite wal        objects containing both words
+    """
+    parts = cmd_line.split(maxsplit=1)
+    if len(parts) < 2:
+        app.log_view.append("Usage: :find WORDS")
+        app.input.value = ""
+        return
+    query = parts[1]
+    cas = get_cas()
+    results = cas.find(query, sources=FIND_SOURCES)
+    app.log_view.append(f"[find] {len(results)} matches for {query!r}")
+    words = [w.lower() for w in query.split()]
+    for r in results:
+        when = time.strftime("%Y-%m-%d %H:%M", time.localtime(r["created"]))
+        label = " ".join(x for x in (r["source"], r["model"]) if x)
+        first = ""
+        for line in (cas.get(r["hash"]) or "").splitlines():
+            if any(w in line.lower() for w in words):
+                first = line.strip()[:60]
+                break
+        app.log_view.append(f"  {r['hash'][:12]} {when} {label} | {first}")
+    app.input.value = ""
+
+
+def show_folder(app, path: str, details: bool = False) -> bool:
+    """List a directory in the log, FOLDER_PAGE entries at a time."""
+    entries, error = scan_folder(path)
+    app.log_view.clear()
+    app.log_view.set_title(os.path.basename(path) or path)
+    app.log_view.append(f"# {path}")
+    app.listing = None
+    if error:
+        app.log_view.append(error)
+        app.log_view.append("§§§")
+        return False
+    if not entries:
+        app.log_view.extend(["(empty directory)", "§§§"])
+        return True
+    app.listing = (entries, 0, details)
+    _show_listing_page(app)
+    return True
+
+
+def _show_listing_page(app) -> None:
+    entries, shown, details = app.listing
+    page = entries[shown : shown + FOLDER_PAGE]
+    shown += len(page)
+    lines = format_entries(page, details)
+    left = len(entries) - shown
+    if left:
+        lines.append(f"... {left:,} more entries (:more)")
+        app.listing = (entries, shown, details)
+    else:
+        lines.append("§§§")
+        app.listing = None
+    app.log_view.extend(lines)
+
+
+def command_ls(app, cmd_line):
+    """
+    List a directory.
+
+    Usage:
+      :ls [-l] [DIR]   list DIR (default: the current one); -l adds size
+                       and modification time columns
+    """
+    parts = cmd_line.split(maxsplit=2)[1:]
+    details = bool(parts) and parts[0] == "-l"
+    if details:
+        parts = parts[1:]
+    show_folder(app, parts[0] if parts else ".", details)
+    app.input.value = ""
+
+
+def command_more(app):
+    """Show the next page of the last directory listing."""
+    if getattr(app, "listing", None):
+        _show_listing_page(app)
+    else:
+        app.log_view.append("Nothing more to list")
+    app.input.value = ""
+
+
 def command_clear(app):
+    app.listing = None
     app.log_view.clear()
     app.log_view.set_title("Conch TUI")
     app.input.value = ""
 
 
 def command_help(app):
-    for line in app.HELP_TEXT.strip().split("\n"):
-        app.log_view.append(line)
+    app.log_view.extend(app.HELP_TEXT.strip().split("\n"))
     app.input.value = ""
 
 
@@ -133,8 +677,7 @@ def command_model(app):
 
 
 def command_lorem(app):
-    for line in LOREM:
-        app.log_view.append(line)
+    app.log_view.extend(LOREM)
     app.input.value = ""
 
 
@@ -150,14 +693,90 @@ def command_paste(app):
     app.input.value = ""
 
 
+async def run_file_index(app) -> int:
+    """Bring app.file_index up to date a batch of directories at a time."""
+    index: FileIndex = app.file_index
+    steps = index.scan_steps()
+    while True:
+        seen = await asyncio.to_thread(next, steps, None)
+        if seen is None:
+            break
+        app.busy_indicator.update(f"Indexing files: {seen:,}")
+    app.busy_indicator.update(":idle")
+    return len(index)
+
+
+def _refresh_file_index(app) -> asyncio.Task:
+    """Start a rescan of the file index unless one is running."""
+    task = getattr(app, "index_task", None)
+    if task is None or task.done():
+        task = asyncio.get_running_loop().create_task(run_file_index(app))
+        app.index_task = task
+    return task
+
+
+async def run_open(app, query: str) -> list[str]:
+    """Open the best match for ``query``, or list the matches to pick from."""
+    index: FileIndex = app.file_index
+    task = _refresh_file_index(app)
+    if not index.ready:
+        # Only the first search waits; later ones use the index as it is
+        # while it is refreshed in the background.
+        await task
+    matches = index.find(query)
+    if index.root != ".":
+        matches = [os.path.join(index.root, m) for m in matches]
+    if not matches:
+        app.log_view.append(f"[open] no files match '{query}'")
+    elif len(matches) == 1:
+        app._read_path(matches[0])
+    else:
+        app.log_view.append(
+            f"[open] {len(matches)} matches for '{query}' (:gf opens one)"
+        )
+        app.log_view.extend(f"  {m}" for m in matches)
+    return matches
+
+
+def command_open(app, cmd_line):
+    """
+    Fuzzy-find a file under the current directory and open it.
+
+    Usage:
+      :open QUERY    open the file whose path best matches QUERY (its
+                     letters in order, e.g. "lgvw" for logview.py)
+    """
+    parts = cmd_line.split(maxsplit=1)
+    if len(parts) < 2:
+        app.log_view.append("Usage: :open QUERY")
+        app.input.value = ""
+        return None
+    app.open_task = asyncio.get_running_loop().create_task(run_open(app, parts[1]))
+    app.input.value = ""
+    return app.open_task
+
+
+def _gf_from_index(app, filename: str) -> None:
+    """Open ``filename`` if it names exactly one indexed file, else report it."""
+    index = getattr(app, "file_index", None)
+    suffix = "/" + filename
+    found = [
+        p for p in (index.paths if index else []) if p == filename or p.endswith(suffix)
+    ]
+    if len(found) == 1:
+        app._read_path(os.path.join(index.root, found[0]))
+    else:
+        app.log_view.append(f"Error: File '{filename}' not found")
+
+
 def command_gf(app):
-    buffer = [getattr(line, "text", str(line)) for line in app.log_view.lines]
-    if app.dot[0] < len(buffer):
-        filename = buffer[app.dot[0]].strip()
+    log = app.log_view
+    if app.dot[0] < log.line_count:
+        filename = log.get_lines(app.dot[0], app.dot[0] + 1)[0].strip()
         if os.path.exists(filename):
             app._read_path(filename)
         elif app.dot[0] != 0:
-            base = buffer[0].strip()
+            base = log.get_lines(0, 1)[0].strip()
             if base.startswith("#"):
                 base = base[1:].strip()
             if base and os.path.exists(base):
@@ -165,9 +784,9 @@ def command_gf(app):
                 if os.path.exists(candidate):
                     app._read_path(candidate)
                 else:
-                    app.log_view.append(f"Error: File '{filename}' not found")
+                    _gf_from_index(app, filename)
             else:
-                app.log_view.append(f"Error: File '{filename}' not found")
+                _gf_from_index(app, filename)
         else:
-            app.log_view.append(f"Error: File '{filename}' not found")
+            _gf_from_index(app, filename)
     app.input.value = ""
@@ -0,0 +1,264 @@
+"""fileindex.py: an index of the files under a directory, for fuzzy opening.
+
+The tree is walked with ``os.scandir`` a batch of directories at a time,
+skipping what ``.gitignore`` files exclude. Each directory's listing is
+kept with its mtime and those of the ``.gitignore`` files that apply to
+it, so a rescan only re-lists the directories whose entries or rules
+changed and reuses the rest. Queries are fuzzy: the letters of
+the query must appear in order in the path.
+"""
+
+from __future__ import annotations
+
+import heapq
+import os
+import re
+from typing import Iterator, NamedTuple
+
+# Directories scanned per indexing step.
+SCAN_BATCH = 256
+# Matches returned by FileIndex.find by default.
+FIND_LIMIT = 20
+# Always skipped, ignore files or not.
+SKIP_DIRS = frozenset({".git", ".hg", ".svn"})
+
+
+class Rule(NamedTuple):
+    base: str  # directory of the .gitignore, relative to the root
+    pattern: re.Pattern
+    negate: bool
+    dir_only: bool
+    anchored: bool  # matched against the whole path, not just the name
+
+
+def _glob_to_regex(glob: str) -> str:
+    """Translate a gitignore glob, where ``*`` stops at slashes."""
+    out, i, n = [], 0, len(glob)
+    while i < n:
+        c = glob[i]
+        if glob.startswith("**/", i):
+            out.append("(?:.*/)?")
+            i += 3
+            continue
+        if glob.startswith("**", i):
+            out.append(".*")
+            i += 2
+            continue
+        if c == "*":
+            out.append("[^/]*")
+        elif c == "?":
+            out.append("[^/]")
+        elif c == "[":
+            j = glob.find("]", i + 1)
+            if j < 0:
+                out.append(re.escape(c))
+            else:
+                body = glob[i + 1 : j]
+                if body.startswith("!"):
+                    body = "^" + body[1:]
+                out.append(f"[{body}]")
+                i = j
+        elif c == "\\" and i + 1 < n:
+            i += 1
+            out.append(re.escape(glob[i]))
+        else:
+            out.append(re.escape(c))
+        i += 1
+    return "".join(out) + r"\Z"
+
+
+def parse_gitignore(text: str, base: str = "") -> list[Rule]:
+    """Rules of a .gitignore file found in directory ``base``."""
+    rules = []
+    for line in text.splitlines():
+        line = line.rstrip()
+        if not line or line.startswith("#"):
+            continue
+        negate = line.startswith("!")
+        if negate:
+            line = line[1:]
+        dir_only = line.endswith("/")
+        line = line.rstrip("/")
+        anchored = "/" in line
+        line = line.lstrip("/")
+        if not line:
+            continue
+        rules.append(
+            Rule(base, re.compile(_glob_to_regex(line)), negate, dir_only, anchored)
+        )
+    return rules
+
+
+def is_ignored(rules: list[Rule], path: str, is_dir: bool) -> bool:
+    """Whether ``path`` (relative to the root) is ignored; the last rule wins."""
+    name = path.rpartition("/")[2]
+    ignored = False
+    for rule in rules:
+        if rule.dir_only and not is_dir:
+            continue
+        if rule.base:
+            if not path.startswith(rule.base + "/"):
+                continue
+            rel = path[len(rule.base) + 1 :]
+        else:
+            rel = path
+        if rule.pattern.match(rel if rule.anchored else name):
+            ignored = not rule.negate
+    return ignored
+
+
+def _mtime(path: str) -> int | None:
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+class _Dir(NamedTuple):
+    mtime: int
+    files: list[str]  # paths relative to the root
+    subdirs: list[str]
+    rules: list[Rule]  # rules from this directory's .gitignore
+    ignore_mtime: int | None  # of this directory's .gitignore, if any
+    inherited: tuple[int, ...]  # ignore_mtime of the ancestors that have one
+
+
+class FileIndex:
+    """Paths of the files under ``root``, rebuilt incrementally by ``scan``."""
+
+    def __init__(self, root: str = "."):
+        self.root = root
+        self._dirs: dict[str, _Dir] = {}
+        self._paths: list[str] | None = None
+        self.scans = 0  # completed scans
+
+    @property
+    def ready(self) -> bool:
+        return self.scans > 0
+
+    @property
+    def paths(self) -> list[str]:
+        """Indexed file paths, relative to the root."""
+        if self._paths is None:
+            # list() copies the values in one step, so a scan running on
+            # another thread cannot change the dict while we walk it.
+            dirs = list(self._dirs.values())
+            self._paths = [p for d in dirs for p in d.files]
+        return self._paths
+
+    def __len__(self) -> int:
+        return len(self.paths)
+
+    def scan_steps(self, batch: int = SCAN_BATCH) -> Iterator[int]:
+        """Walk the tree ``batch`` directories at a time, yielding files seen.
+
+        Directories whose mtime, and the mtimes of the .gitignore files
+        that apply to them, have not changed since the last scan are not
+        listed again. Results become visible as they are found on the
+        first scan, and all at once on later ones.
+        """
+        old = self._dirs
+        new: dict[str, _Dir] = {}
+        if not self.ready:
+            self._dirs = new
+        stack: list[tuple[str, list[Rule], tuple[int, ...]]] = [("", [], ())]
+        seen = done = 0
+        while stack:
+            rel, rules, inherited = stack.pop()
+            entry = self._scan_dir(rel, rules, inherited, old.get(rel))
+            if entry is None:
+                continue
+            new[rel] = entry
+            self._paths = None
+            seen += len(entry.files)
+            rules = rules + entry.rules
+            if entry.ignore_mtime is not None:
+                inherited += (entry.ignore_mtime,)
+            stack.extend((d, rules, inherited) for d in reversed(entry.subdirs))
+            done += 1
+            if done % batch == 0:
+                yield seen
+        self._dirs = new
+        self._paths = None
+        self.scans += 1
+        yield seen
+
+    def scan(self) -> "FileIndex":
+        """Index the whole tree now."""
+        for _ in self.scan_steps():
+            pass
+        return self
+
+    def _scan_dir(
+        self,
+        rel: str,
+        rules: list[Rule],
+        inherited: tuple[int, ...],
+        cached: _Dir | None,
+    ) -> _Dir | None:
+        path = os.path.join(self.root, rel) if rel else self.root
+        mtime = _mtime(path)
+        if mtime is None:
+            return None
+        ignore_path = os.path.join(path, ".gitignore")
+        # Editing a .gitignore leaves its directory's mtime alone, so the
+        # rule files are checked too: this one's and its ancestors'.
+        if (
+            cached is not None
+            and cached.mtime == mtime
+            and cached.inherited == inherited
+            and (
+                cached.ignore_mtime is None
+                or cached.ignore_mtime == _mtime(ignore_path)
+            )
+        ):
+            return cached
+        try:
+            with os.scandir(path) as it:
+                entries = sorted(it, key=lambda e: e.name)
+        except OSError:
+            return None
+        prefix = rel + "/" if rel else ""
+        own: list[Rule] = []
+        ignore_mtime = None
+        if any(e.name == ".gitignore" for e in entries):
+            ignore_mtime = _mtime(ignore_path)
+            try:
+                with open(ignore_path, encoding="utf-8") as f:
+                    own = parse_gitignore(f.read(), rel)
+            except (OSError, UnicodeDecodeError):
+                pass
+        rules = rules + own
+        files, subdirs = [], []
+        for e in entries:
+            child = prefix + e.name
+            try:
+                is_dir = e.is_dir(follow_symlinks=False)
+            except OSError:
+                continue
+            if is_dir and e.name in SKIP_DIRS:
+                continue
+            if is_ignored(rules, child, is_dir):
+                continue
+            (subdirs if is_dir else files).append(child)
+        return _Dir(mtime, files, subdirs, own, ignore_mtime, inherited)
+
+    def find(self, query: str, limit: int = FIND_LIMIT) -> list[str]:
+        """Best ``limit`` paths containing the letters of ``query`` in order.
+
+        Paths whose file name contains the query come first, then those
+        where the letters are closest together, then shorter paths.
+        """
+        query = query.strip()
+        if not query:
+            return []
+        fuzzy = re.compile(".*?".join(map(re.escape, query)), re.IGNORECASE)
+        needle = query.lower()
+        scored = []
+        for path in self.paths:
+            m = fuzzy.search(path)
+            if m is None:
+                continue
+            name = path.rpartition("/")[2].lower()
+            scored.append((needle not in name, m.end() - m.start(), len(path), path))
+        return [s[-1] for s in heapq.nsmallest(limit, scored)]
@@ -1,10 +1,88 @@
+import mmap
 import os
-from typing import Tuple, Optional, List, TypeAlias, Union
+import time
+from array import array
+from collections.abc import Sequence
+from itertools import accumulate, count
+from operator import add
+from typing import Iterator, Tuple, Optional, List, TypeAlias, Union
 
 Pathish = Union[str, os.PathLike]
 
 ResultWithErrorStr: TypeAlias = Tuple[Optional[List[str]], Optional[str]]
 
+# Files at least this big are memory-mapped and indexed lazily instead of
+# being read and split up front.
+LAZY_MIN = 4 * 1024 * 1024
+# Bytes scanned for newlines per indexing step.
+INDEX_CHUNK = 4 * 1024 * 1024
+# Bytes read to decide whether a file is binary, and shown of one that is.
+SNIFF_BYTES = 8192
+PREVIEW_BYTES = 64 * 1024
+# Share of control bytes above which a block counts as binary.
+BINARY_RATIO = 0.3
+
+# Bytes that can appear in text: printable ASCII, any byte of a UTF-8 (or
+# legacy 8-bit) character, and the usual controls (tab, newline, escape...).
+_TEXT_BYTES = bytes(
+    {7, 8, 9, 10, 12, 13, 27} | set(range(0x20, 0x7F)) | set(range(0x80, 0x100))
+)
+_PRINTABLE = bytes(b if 0x20 <= b < 0x7F else ord(".") for b in range(256))
+
+
+def looks_binary(block: bytes) -> bool:
+    """Guess from a file's first block whether it is binary.
+
+    A NUL byte is decisive; otherwise the block is binary when more than
+    BINARY_RATIO of it is control bytes that text files do not contain.
+    """
+    if not block:
+        return False
+    if b"\0" in block:
+        return True
+    odd = len(block.translate(None, _TEXT_BYTES))
+    return odd / len(block) > BINARY_RATIO
+
+
+def is_binary_file(filename: Pathish) -> bool:
+    """Sniff the first SNIFF_BYTES of a file; False if it cannot be read."""
+    try:
+        with open(filename, "rb") as f:
+            return looks_binary(f.read(SNIFF_BYTES))
+    except OSError:
+        return False
+
+
+def hex_dump(data: bytes, offset: int = 0) -> List[str]:
+    """Format ``data`` as ``hexdump -C`` style lines of 16 bytes."""
+    lines = []
+    for i in range(0, len(data), 16):
+        row = data[i : i + 16]
+        hexes = row[:8].hex(" ") + "  " + row[8:].hex(" ")
+        lines.append(
+            f"{offset + i:08x}  {hexes:<48}  |{row.translate(_PRINTABLE).decode()}|"
+        )
+    return lines
+
+
+def hex_preview(filename: Pathish, limit: int = PREVIEW_BYTES) -> ResultWithErrorStr:
+    """Hex dump of the first ``limit`` bytes of a file; the rest is not read."""
+    path = os.fspath(filename)
+    try:
+        with open(path, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            data = f.read(limit)
+    except FileNotFoundError:
+        return None, f"Error: File '{path}' not found"
+    except PermissionError:
+        return None, f"Error: Permission denied accessing '{path}'"
+    except Exception as e:
+        return None, f"Error accessing '{path}': {e}"
+    lines = hex_dump(data)
+    if size > len(data):
+        lines.append(f"... {size - len(data):,} more bytes not shown")
+    return lines, None
+
 
 def load_file(filename: Pathish) -> ResultWithErrorStr:
     """Read a file and return its contents as a list of lines.
@@ -13,11 +91,17 @@ def load_file(filename: Pathish) -> ResultWithErrorStr:
     ``os.fspath`` normalises the value so tests can freely pass ``Path``
     objects without causing a ``TypeError`` on Windows or other
     platforms.
+
+    The first block is sniffed before the rest is read, so a binary file
+    is rejected without reading (or decoding) all of it.
     """
     path = os.fspath(filename)
     try:
-        with open(path, "r", encoding="utf-8") as f:
-            content = f.read()
+        with open(path, "rb") as f:
+            head = f.read(SNIFF_BYTES)
+            if looks_binary(head):
+                return None, f"Error: '{path}' looks like a binary file"
+            content = (head + f.read()).decode("utf-8")
         return content.splitlines(), None
     except FileNotFoundError:
         return None, f"Error: File '{path}' not found"
@@ -30,26 +114,172 @@ def load_file(filename: Pathish) -> ResultWithErrorStr:
     return None, None  # Added to satisfy return type
 
 
-def load_folder(foldername: Pathish) -> ResultWithErrorStr:
-    """List folder contents, marking directories with a trailing slash."""
+def scan_folder(
+    foldername: Pathish,
+) -> Tuple[Optional[List[os.DirEntry]], Optional[str]]:
+    """Return the entries of a folder sorted by name, using ``os.scandir``.
+
+    Nothing is stat'ed here: whether an entry is a directory comes from the
+    type scandir already read, and sizes are only looked up by
+    ``format_entries`` for the entries actually shown.
+    """
     path = os.fspath(foldername)
     try:
-        entries = os.listdir(path)
-        entries.sort()
-        if not entries:
-            return ["(empty directory)"], None
-        result = []
-        for entry in entries:
-            entry_path = os.path.join(path, entry)
-            if os.path.isdir(entry_path):
-                result.append(f"{entry}/")
-            else:
-                result.append(entry)
-        return result, None
+        with os.scandir(path) as it:
+            entries = list(it)
     except PermissionError:
         return None, "Error: Permission denied reading directory"
     except FileNotFoundError:
         return None, f"Error: Directory '{path}' not found"
     except Exception as e:
         return None, f"Error accessing directory '{path}': {e}"
-    return None, None  # Added to satisfy return type
+    entries.sort(key=lambda e: e.name)
+    return entries, None
+
+
+def format_entries(entries: List[os.DirEntry], details: bool = False) -> List[str]:
+    """One line per entry, directories with a trailing slash.
+
+    With ``details`` each line starts with the size and modification time,
+    both from a single stat of the entry.
+    """
+    lines = []
+    for entry in entries:
+        try:
+            is_dir = entry.is_dir()
+        except OSError:
+            is_dir = False
+        name = f"{entry.name}/" if is_dir else entry.name
+        if not details:
+            lines.append(name)
+            continue
+        try:
+            st = entry.stat()
+        except OSError:
+            lines.append(f"{'?':>14}  {'?':<16}  {name}")
+            continue
+        size = "-" if is_dir else f"{st.st_size:,}"
+        mtime = time.strftime("%Y-%m-%d %H:%M", time.localtime(st.st_mtime))
+        lines.append(f"{size:>14}  {mtime}  {name}")
+    return lines
+
+
+def load_folder(foldername: Pathish, details: bool = False) -> ResultWithErrorStr:
+    """List folder contents, marking directories with a trailing slash."""
+    entries, error = scan_folder(foldername)
+    if error:
+        return None, error
+    if not entries:
+        return ["(empty directory)"], None
+    return format_entries(entries, details), None
+
+
+class MappedFile(Sequence):
+    """The lines of a memory-mapped file, indexed a chunk at a time.
+
+    Only the offsets of line starts are kept (4 or 8 bytes a line); the
+    text stays in the page cache and is decoded when a line is read.
+    Until indexing finishes the sequence holds the lines found so far.
+    Lines split on LF with a trailing CR dropped; bad UTF-8 is replaced.
+    """
+
+    def __init__(self, path: Pathish):
+        self.path = os.fspath(path)
+        with open(self.path, "rb") as f:
+            self.size = os.fstat(f.fileno()).st_size
+            self._mm = (
+                mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if self.size else b""
+            )
+        self._starts = array("I" if self.size < 2**32 else "Q", [0])
+        self.indexed = 0  # bytes scanned so far
+        self.widest = 0  # longest line seen, in bytes
+        self.stopped = False  # no more indexing; lines found stay readable
+        self.closed = False
+
+    @property
+    def done(self) -> bool:
+        return self.indexed >= self.size
+
+    @property
+    def progress(self) -> float:
+        return self.indexed / self.size if self.size else 1.0
+
+    def index_steps(self, chunk: int = INDEX_CHUNK) -> Iterator[int]:
+        """Index the file ``chunk`` bytes at a time, yielding bytes done.
+
+        Each step is one C-level split of the chunk, so it can run on a
+        worker thread between UI updates.
+        """
+        starts, size = self._starts, self.size
+        while self.indexed < size and not self.stopped:
+            pos = self.indexed
+            end = min(pos + chunk, size)
+            try:
+                parts = self._mm[pos:end].split(b"\n")
+            except ValueError:  # closed while we were scheduled
+                return
+            full = parts[:-1]
+            if full:
+                # Line k of the chunk ends at pos + sum(len(parts[:k+1])) + k.
+                starts.extend(map(add, accumulate(map(len, full)), count(pos + 1)))
+                self.widest = max(self.widest, max(map(len, full)))
+            self.widest = max(self.widest, len(parts[-1]))
+            if end == size and not self._mm[size - 1 : size] == b"\n":
+                starts.append(size + 1)  # the last line has no newline
+            self.indexed = end
+            yield end
+
+    def index(self) -> "MappedFile":
+        """Index the whole file now."""
+        for _ in self.index_steps():
+            pass
+        return self
+
+    def __len__(self) -> int:
+        return max(len(self._starts) - 1, 0)
+
+    def _decode(self, start: int, stop: int) -> str:
+        return self._mm[start:stop].decode("utf-8", "replace")
+
+    def __getitem__(self, index):
+        n = len(self)
+        if isinstance(index, slice):
+            start, stop, step = index.indices(n)
+            if step != 1:
+                return [self[i] for i in range(start, stop, step)]
+            if start >= stop:
+                return []
+            text = self._decode(self._starts[start], self._starts[stop] - 1)
+            lines = text.split("\n")
+            if "\r" in text:
+                lines = [ln[:-1] if ln.endswith("\r") else ln for ln in lines]
+            return lines
+        if index < 0:
+            index += n
+        if not 0 <= index < n:
+            raise IndexError("line index out of range")
+        line = self._decode(self._starts[index], self._starts[index + 1] - 1)
+        return line[:-1] if line.endswith("\r") else line
+
+    def stop(self) -> None:
+        """Stop indexing, keeping the mapping for the lines already found."""
+        self.stopped = True
+
+    def close(self) -> None:
+        if not self.closed:
+            self.stopped = self.closed = True
+            if self.size:
+                self._mm.close()
+
+
+def open_lines(filename: Pathish) -> Tuple[Optional[MappedFile], Optional[str]]:
+    """Open a file for lazy line access; errors are reported like load_file."""
+    path = os.fspath(filename)
+    try:
+        return MappedFile(path), None
+    except FileNotFoundError:
+        return None, f"Error: File '{path}' not found"
+    except PermissionError:
+        return None, f"Error: Permission denied accessing '{path}'"
+    except Exception as e:
+        return None, f"Error accessing '{path}': {e}"
@@ -0,0 +1,96 @@
+"""jobs.py: a table of shell commands running in the background.
+
+Each job keeps the last ``JOB_OUTPUT_LINES`` lines of its output in its
+own buffer instead of writing to the log, so several can run at once
+without their output interleaving. ``:fg`` copies a buffer to the log
+and follows the job from there on.
+"""
+
+from __future__ import annotations
+
+import asyncio
+from collections import deque
+from typing import Callable, Iterable, Iterator
+
+# Output lines kept per job; older ones are dropped and counted.
+JOB_OUTPUT_LINES = 10_000
+# Finished jobs kept in the table before the oldest are forgotten.
+FINISHED_JOBS = 50
+
+
+class Job:
+    """One background command and the tail of its output."""
+
+    def __init__(self, number: int, command: str, limit: int = JOB_OUTPUT_LINES):
+        self.number = number
+        self.command = command
+        self.output: deque[str] = deque(maxlen=limit)
+        self.dropped = 0  # lines that fell off the front of ``output``
+        self.state = "running"
+        self.code: int | None = None
+        self.task: asyncio.Task | None = None
+        # Called with each batch of new lines while the job is in the
+        # foreground (see :fg).
+        self.follow: Callable[[list[str]], object] | None = None
+
+    @property
+    def running(self) -> bool:
+        return self.state == "running"
+
+    def write(self, lines: Iterable[str]) -> None:
+        lines = list(lines)
+        limit = self.output.maxlen
+        self.dropped += max(len(self.output) + len(lines) - limit, 0)
+        self.output.extend(lines)
+        if self.follow is not None:
+            self.follow(lines)
+
+    def finish(self, state: str, code: int | None = None) -> None:
+        self.state = state
+        self.code = code
+        self.follow = None
+
+    def text(self) -> str:
+        return "\n".join(self.output)
+
+    def describe(self) -> str:
+        return f"[{self.number}] {self.state:<12} {self.command}"
+
+
+class JobManager:
+    """Numbered jobs, like a shell's job table."""
+
+    def __init__(self, finished: int = FINISHED_JOBS):
+        self._jobs: dict[int, Job] = {}
+        self._next = 1
+        self._finished = finished
+
+    def __iter__(self) -> Iterator[Job]:
+        return iter(list(self._jobs.values()))
+
+    def __len__(self) -> int:
+        return len(self._jobs)
+
+    def add(self, command: str) -> Job:
+        job = Job(self._next, command)
+        self._next += 1
+        self._jobs[job.number] = job
+        done = [j for j in self._jobs.values() if not j.running]
+        for old in done[: max(len(done) - self._finished, 0)]:
+            del self._jobs[old.number]
+        return job
+
+    def get(self, number: int | None = None) -> Job | None:
+        """Job ``number``, or the newest job if it is None."""
+        if number is None:
+            return next(reversed(self._jobs.values()), None)
+        return self._jobs.get(number)
+
+    @property
+    def running(self) -> list[Job]:
+        return [j for j in self._jobs.values() if j.running]
+
+    def status(self) -> str:
+        """Text for the busy indicator."""
+        n = len(self.running)
+        return f":jobs {n} running" if n else ":idle"
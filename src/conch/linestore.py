@@ -0,0 +1,184 @@
+"""linestore.py: compact append-only storage for log lines.
+
+Lines live back to back in one UTF-8 ``bytearray``, each followed by a
+newline, with an ``array`` of start offsets. That costs the text plus
+eight bytes a line, instead of a Python object (or several) per line,
+and the whole log can be decoded or split in a single C-level call.
+
+With a ``limit`` and a ``pager`` the store keeps at most ``limit`` lines
+resident: older lines are handed to the pager a page at a time and read
+back on demand, so line numbers stay stable while memory stays bounded.
+Pages are released back to the pager on ``clear`` or when the store is
+garbage collected.
+"""
+
+from __future__ import annotations
+
+import weakref
+from array import array
+from collections import OrderedDict
+from typing import Any, Iterable, Iterator, Protocol, overload
+
+# Lines per spilled page, and how many decoded pages to keep around.
+PAGE_LINES = 4096
+PAGE_CACHE = 4
+
+
+class Pager(Protocol):
+    """Where a LineStore puts lines that no longer fit in memory."""
+
+    def spill(self, text: str) -> Any:
+        """Store ``text`` and return a handle for ``load``."""
+
+    def load(self, handle: Any) -> str:
+        """Return the text stored under ``handle``."""
+
+    def release(self, handles: list[Any]) -> None:
+        """Say that the pages under ``handles`` will not be loaded again."""
+
+
+class LineStore:
+    """An append-only sequence of lines (``str`` without newlines)."""
+
+    def __init__(
+        self,
+        lines: Iterable[str] = (),
+        limit: int | None = None,
+        pager: Pager | None = None,
+    ):
+        self._buf = bytearray()
+        # Offsets count every byte ever resident, so evicting from the
+        # front means bumping _cut instead of rewriting the array.
+        self._starts = array("Q")
+        self._cut = 0
+        self.limit = limit if pager is not None and limit else None
+        self._pager = pager
+        self._page_lines = min(PAGE_LINES, self.limit or PAGE_LINES)
+        self._pages: list[Any] = []
+        self._loaded: OrderedDict[int, list[str]] = OrderedDict()
+        self._release_pages()
+        self.extend(lines)
+
+    def _release_pages(self) -> None:
+        """Hand the current page list back to the pager when it is dropped."""
+        if self._pager is not None:
+            # The finalizer holds the list, not the store, so it does not
+            # keep the store alive; it runs on clear() or collection.
+            self._finalizer = weakref.finalize(self, _release, self._pager, self._pages)
+            self._finalizer.atexit = False
+
+    def __len__(self) -> int:
+        return self.spilled + len(self._starts)
+
+    @property
+    def spilled(self) -> int:
+        """Number of lines handed to the pager."""
+        return len(self._pages) * self._page_lines
+
+    def append(self, line: str) -> None:
+        self._starts.append(self._cut + len(self._buf))
+        self._buf += line.encode("utf-8")
+        self._buf += b"\n"
+        if self.limit is not None and len(self._starts) > self.limit:
+            self._evict()
+
+    def extend(self, lines: Iterable[str]) -> None:
+        for line in lines:
+            self.append(line)
+
+    def clear(self) -> None:
+        self._buf = bytearray()
+        self._starts = array("Q")
+        self._cut = 0
+        if self._pager is not None:
+            self._finalizer()
+        self._pages = []
+        self._loaded.clear()
+        self._release_pages()
+
+    def _evict(self) -> None:
+        """Spill the oldest page of resident lines to the pager."""
+        n = self._page_lines
+        text = self._span(0, n).decode("utf-8")
+        self._pages.append(self._pager.spill(text))
+        cut = self._starts[n] - self._cut
+        del self._buf[:cut]
+        del self._starts[:n]
+        self._cut += cut
+
+    def _page(self, number: int) -> list[str]:
+        """Lines of spilled page ``number``, from the cache or the pager."""
+        lines = self._loaded.get(number)
+        if lines is None:
+            lines = self._pager.load(self._pages[number]).split("\n")
+            self._loaded[number] = lines
+            if len(self._loaded) > PAGE_CACHE:
+                self._loaded.popitem(last=False)
+        else:
+            self._loaded.move_to_end(number)
+        return lines
+
+    def _span(self, start: int, stop: int) -> bytes:
+        """Bytes of resident lines start..stop-1, without the final newline."""
+        starts, cut = self._starts, self._cut
+        end = starts[stop] - cut - 1 if stop < len(starts) else len(self._buf) - 1
+        return bytes(self._buf[starts[start] - cut : end])
+
+    def _lines(self, start: int, stop: int) -> list[str]:
+        """Lines start..stop-1 (0 <= start < stop <= len), paging in as needed."""
+        out: list[str] = []
+        size = self._page_lines
+        while start < min(stop, self.spilled):
+            number, first = divmod(start, size)
+            taken = self._page(number)[first : first + stop - start]
+            out.extend(taken)
+            start += len(taken)
+        if start < stop:
+            spilled = self.spilled
+            span = self._span(start - spilled, stop - spilled)
+            out.extend(span.decode("utf-8").split("\n"))
+        return out
+
+    @overload
+    def __getitem__(self, index: int) -> str: ...
+
+    @overload
+    def __getitem__(self, index: slice) -> list[str]: ...
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            rng = range(len(self))[index]
+            if rng.step != 1:
+                return [self[i] for i in rng]
+            if not rng:
+                return []
+            return self._lines(rng.start, rng.stop)
+        n = len(self)
+        if index < 0:
+            index += n
+        if not 0 <= index < n:
+            raise IndexError("line index out of range")
+        if index < self.spilled:
+            number, first = divmod(index, self._page_lines)
+            return self._page(number)[first]
+        index -= self.spilled
+        return self._span(index, index + 1).decode("utf-8")
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self[:])
+
+    def text(self) -> str:
+        """All lines joined with newlines."""
+        if self._pages:
+            return "\n".join(self[:])
+        return self._buf[:-1].decode("utf-8") if self._buf else ""
+
+    @property
+    def nbytes(self) -> int:
+        """Approximate memory held by the resident lines."""
+        return len(self._buf) + self._starts.itemsize * len(self._starts)
+
+
+def _release(pager: Pager, pages: list[Any]) -> None:
+    if pages:
+        pager.release(pages)
@@ -1,54 +1,403 @@
-from textual.widgets import RichLog
+from typing import Iterable, Iterator, Sequence, Union
+
+from rich.cells import cell_len
+from rich.control import strip_control_codes
 from rich.segment import Segment
+from rich.style import Style
+from rich.text import Text
+from textual.geometry import Size
+from textual.scroll_view import ScrollView
+from textual.strip import Strip
+
+from .files import MappedFile
+from .linestore import LineStore, Pager
+from .piecetable import PieceTable
 
 
-class LogView(RichLog):
-    """Scrollable log area using RichLog for better performance and scrolling.
+class LogView(ScrollView, can_focus=False):
+    """Scrollable log area that only renders the rows on screen.
 
-    RichLog is designed specifically for logging output with automatic
-    scrolling, line wrapping, and proper performance with large amounts of text.
+    Text is kept in a compact LineStore and turned into strips on demand,
+    so memory tracks the size of the text and drawing cost tracks the
+    height of the viewport, not the length of the log. Given a
+    ``scrollback`` limit and a ``pager``, older lines are paged out of
+    memory and read back when scrolled to or addressed. A large file can
+    be shown straight from its mapping with ``show_file``, and a sam
+    buffer straight from its piece table with ``show_lines``.
     """
 
-    def __init__(self, *args, **kwargs):
-        self._lines_buf: list[Segment] = []
+    DEFAULT_CSS = """
+    LogView {
+        background: $surface;
+        color: $foreground;
+        overflow-y: scroll;
+    }
+    """
+
+    def __init__(
+        self,
+        *args,
+        scrollback: int | None = None,
+        pager: Pager | None = None,
+        **kwargs,
+    ):
+        self._scrollback = scrollback
+        self._pager = pager
+        # Every line written goes to this one store, so the scrollback
+        # limit holds however many edits are shown over it.
+        self._lines = self._new_store()
+        self._store: Union[LineStore, "_ViewStore"] = self._lines
+        self._mapped: MappedFile | None = None
+        # The table last shown or snapshotted, to measure edits of it by
+        # their changes alone.
+        self._shown_lines: Sequence[str] | None = None
+        self._widest = 0
+        # Bumped on every change of content, so callers can tell whether a
+        # copy of the lines they took earlier is still current.
+        self.generation = 0
+        # Inclusive (start, end) range drawn with _highlight_style, applied
+        # at render time so moving it only repaints the rows that change.
+        self._highlight: tuple[int, int] | None = None
+        self._highlight_style = Style()
         super().__init__(*args, **kwargs)
-        self.can_focus = False
         self.auto_scroll = False
 
+    def write(self, content: object) -> "LogView":
+        """Add ``content`` (a str, Text or Segment) to the end of the log."""
+        return self.extend([_plain(content)])
+
     def append(self, text: str) -> None:
-        for ln in text.splitlines() or [""]:
-            try:
-                self.write(ln)
-            except Exception:
-                self._lines_buf.append(Segment(ln))
+        self.extend([text])
+
+    def extend(self, lines: Iterable[str]) -> "LogView":
+        """Add ``lines`` to the end of the log with a single refresh.
+
+        Items containing newlines are split, as with ``write``.
+        """
+        store, widest = self._store, self._widest
+        for text in lines:
+            for ln in strip_control_codes(text).splitlines() or [""]:
+                store.append(ln)
+                width = cell_len(ln.expandtabs())
+                if width > widest:
+                    widest = width
+        self._widest = widest
+        self._content_changed()
+        if self.auto_scroll:
+            self.scroll_end(animate=False, immediate=False, x_axis=False)
+        return self
+
+    def show_file(self, mapped: MappedFile) -> None:
+        """Show the lines of ``mapped`` after the current ones, without copying.
+
+        The file may still be indexing: call ``file_grew`` as it makes
+        progress. Later writes go after the file; ``clear`` closes it.
+        """
+        if self._mapped is not None:
+            self.clear()
+        self._mapped = mapped
+        self._store = _ViewStore([self._frozen(), _Clean(mapped), self._tail()])
+        self.file_grew()
+
+    def file_grew(self) -> None:
+        """Pick up lines the shown file has indexed since the last call."""
+        if self._mapped is not None:
+            self._widest = max(self._widest, self._mapped.widest)
+            self._content_changed()
+
+    def snapshot(self) -> PieceTable:
+        """The lines shown now, as a table later writes do not change.
+
+        Nothing is copied: the table refers to the stores and file behind
+        the log, which only grow. An edit of it passed to ``show_lines``
+        is measured by its changes alone.
+        """
+        table = self._frozen()
+        self._shown_lines = table
+        return table
+
+    def _frozen(self) -> PieceTable:
+        store = self._store
+        return PieceTable.view(*(store.parts if store is not self._lines else [store]))
+
+    def show_lines(self, lines: Sequence[str]) -> None:
+        """Replace the log with ``lines``, shown in place rather than copied.
+
+        ``lines`` must not change afterwards (a PieceTable never does).
+        When it is a table edited from the one shown or snapshotted last,
+        only the lines that differ are measured, so showing an edit of a
+        long buffer costs time in the size of the edit. Later writes go
+        after the lines.
+        """
+        old, fresh = self._shown_lines, lines
+        self._close_file()
+        if isinstance(old, PieceTable) and isinstance(lines, PieceTable):
+            start, _, stop = old.diff(lines)
+            fresh = lines[start:stop]
+        else:
+            self._widest = 0
+        self._widest = max([self._widest, *(cell_len(ln.expandtabs()) for ln in fresh)])
+        self._store = _ViewStore([lines, self._tail()])
+        self._shown_lines = lines
+        self._content_changed()
 
     def clear(self) -> None:
-        super().clear()
-        self.lines = []
+        # A new store, not store.clear(): snapshots may still refer to the
+        # old one, which releases its pages when they are gone.
+        self._close_file()
+        self._lines = self._store = self._new_store()
+        self._shown_lines = None
+        self._widest = 0
+        self._highlight = None
+        self._content_changed()
+
+    def _new_store(self) -> LineStore:
+        return LineStore(limit=self._scrollback, pager=self._pager)
+
+    def _tail(self) -> "_Tail":
+        """Where lines written after what is shown now go."""
+        return _Tail(self._lines, len(self._lines))
+
+    def _close_file(self) -> None:
+        # Snapshots may still read the file; the mapping goes with them.
+        if self._mapped is not None:
+            self._mapped.stop()
+            self._mapped = None
+
+    def _content_changed(self) -> None:
+        self.generation += 1
+        self.virtual_size = Size(self._widest, len(self._store))
+        self.refresh()
 
     def set_title(self, title: str) -> None:
         self.border_title = title
 
+    def set_highlight(self, start: int, end: int, style: Style | str) -> None:
+        """Highlight lines ``start``..``end`` (inclusive) with ``style``.
+
+        Only the rows entering or leaving the highlight are refreshed, so
+        moving a one-line dot costs the same regardless of log length.
+        """
+        if isinstance(style, str):
+            style = Style.parse(style)
+        old = self._highlight
+        new = (min(start, end), max(start, end))
+        runs = _changed_rows(old, new)
+        if style != self._highlight_style:
+            self._highlight_style = style
+            # Every highlighted row changes colour, and the old rows lose it.
+            runs = _changed_rows(None, new)
+            if old is not None:
+                runs += _changed_rows(None, old)
+        self._highlight = new
+        for first, count in runs:
+            self.refresh_lines(first, count)
+
+    def render_line(self, y: int) -> Strip:
+        scroll_x, scroll_y = self.scroll_offset
+        return self._render_line(
+            scroll_y + y, scroll_x, self.scrollable_content_region.width
+        )
+
+    def _render_line(self, index: int, scroll_x: int, width: int) -> Strip:
+        style = self.rich_style
+        if index >= len(self._store):
+            return Strip.blank(width, style)
+        hl = self._highlight
+        if hl is not None and hl[0] <= index <= hl[1]:
+            style = style + self._highlight_style
+        try:
+            text = self._store[index].expandtabs()
+        except LookupError as e:  # a paged-out line could not be read back
+            text = f"[{e}]"
+        return Strip([Segment(text, style)]).crop_extend(
+            scroll_x, scroll_x + width, style
+        )
+
     def get_lines(self, a: int = 0, b: int = -1) -> list[str]:
         """
         Get lines from the buffer between indices a and b.
         """
+        n = len(self._store)
         if a < 0:
-            a = len(self._lines_buf) + a
+            a = n + a
         if b < 0:
-            b = len(self._lines_buf) + b
+            b = n + b
         if a > b:
             return self.get_lines(b, a)
         if a == b:
             return self.get_lines(a, a + 1)
-        selection = self._lines_buf[a:b]
-        # Segment.text is not available, use Segment's 'text' attribute
-        return [seg.text if hasattr(seg, "text") else str(seg) for seg in selection]
+        return self._store[max(a, 0) : max(b, 0)]
+
+    def text_lines(self) -> list[str]:
+        """Every line in the log, as a new list."""
+        return self._store[:]
+
+    def get_text(self) -> str:
+        """The whole log as one newline-joined string."""
+        return self._store.text()
+
+    @property
+    def line_count(self) -> int:
+        return len(self._store)
 
     @property
-    def lines(self) -> list[Segment]:
-        return self._lines_buf
+    def lines(self) -> "_LineView":
+        """Read-only view of the log; each item is a Segment with ``.text``."""
+        return _LineView(self._store)
 
     @lines.setter
     def lines(self, value: list[Segment | str]) -> None:
-        self._lines_buf = [v if isinstance(v, Segment) else Segment(v) for v in value]
+        self.clear()
+        self.extend(_plain(v) for v in value)
+
+
+class _ViewStore:
+    """The LineStore interface over several sequences shown one after another.
+
+    Each part is shown in place; appends go to the last, a _Tail.
+    """
+
+    def __init__(self, parts: list[Sequence[str]]):
+        self.parts = parts
+        self.tail: _Tail = parts[-1]
+
+    def __len__(self) -> int:
+        return sum(map(len, self.parts))
+
+    @property
+    def spilled(self) -> int:
+        return sum(getattr(p, "spilled", 0) for p in self.parts)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(getattr(p, "nbytes", 0) for p in self.parts)
+
+    def append(self, line: str) -> None:
+        self.tail.append(line)
+
+    def _spans(self) -> list[tuple[int, Sequence[str]]]:
+        spans, first = [], 0
+        for part in self.parts:
+            spans.append((first, part))
+            first += len(part)
+        return spans
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            rng = range(len(self))[index]
+            if rng.step != 1:
+                return [self[i] for i in rng]
+            out: list[str] = []
+            for first, part in self._spans():
+                lo = max(rng.start - first, 0)
+                hi = min(rng.stop - first, len(part))
+                if lo < hi:
+                    out.extend(part[lo:hi])
+            return out
+        n = len(self)
+        if index < 0:
+            index += n
+        if not 0 <= index < n:
+            raise IndexError("line index out of range")
+        for first, part in self._spans():
+            if index < first + len(part):
+                return part[index - first]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self[:])
+
+    def text(self) -> str:
+        return "\n".join(self[:])
+
+
+class _Tail(Sequence):
+    """The lines of ``store`` from ``start`` on, growing as it does."""
+
+    def __init__(self, store: LineStore, start: int):
+        self.store = store
+        self.start = start
+
+    def __len__(self) -> int:
+        return len(self.store) - self.start
+
+    @property
+    def spilled(self) -> int:
+        return max(self.store.spilled - self.start, 0)
+
+    @property
+    def nbytes(self) -> int:
+        return self.store.nbytes
+
+    def append(self, line: str) -> None:
+        self.store.append(line)
+
+    def __getitem__(self, index):
+        n = len(self)
+        if isinstance(index, slice):
+            start, stop, step = index.indices(n)
+            return self.store[self.start + start : self.start + stop : step]
+        if index < 0:
+            index += n
+        if not 0 <= index < n:
+            raise IndexError("line index out of range")
+        return self.store[self.start + index]
+
+
+class _Clean(Sequence):
+    """Lines of a mapped file with control codes removed, as ``write`` does."""
+
+    def __init__(self, file: MappedFile):
+        self.file = file
+
+    def __len__(self) -> int:
+        return len(self.file)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [strip_control_codes(ln) for ln in self.file[index]]
+        return strip_control_codes(self.file[index])
+
+
+class _LineView(Sequence):
+    """Lazy Sequence of Segments over a LineStore, for older callers."""
+
+    def __init__(self, store: Union[LineStore, _ViewStore]):
+        self._store = store
+
+    def __len__(self) -> int:
+        return len(self._store)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [Segment(t) for t in self._store[index]]
+        return Segment(self._store[index])
+
+    def __iter__(self) -> Iterator[Segment]:
+        return (Segment(t) for t in self._store[:])
+
+
+def _plain(content: object) -> str:
+    """Text of a str, Text or Segment (anything else via str())."""
+    if isinstance(content, Text):
+        return content.plain
+    if isinstance(content, Segment):
+        return content.text
+    return str(content)
+
+
+def _changed_rows(
+    old: tuple[int, int] | None, new: tuple[int, int]
+) -> list[tuple[int, int]]:
+    """Return (first, count) runs of rows in exactly one of two ranges."""
+    if old is None:
+        return [(new[0], new[1] - new[0] + 1)]
+    if old[1] < new[0] or new[1] < old[0]:
+        return [(old[0], old[1] - old[0] + 1), (new[0], new[1] - new[0] + 1)]
+    runs = []
+    lo, hi = sorted((old[0], new[0])), sorted((old[1], new[1]))
+    if lo[0] != lo[1]:
+        runs.append((lo[0], lo[1] - lo[0]))
+    if hi[0] != hi[1]:
+        runs.append((hi[0] + 1, hi[1] - hi[0]))
+    return runs
@@ -0,0 +1,211 @@
+"""piecetable.py: an immutable, list-like buffer of lines for sam edits.
+
+A PieceTable is a sequence of pieces, each a run of lines in some list
+that is never modified. An edit builds a new table that shares every
+untouched piece with the old one and adds one piece for the new lines,
+so its cost depends on the number of pieces, not the number of lines,
+and older tables stay valid (handy for undo).
+
+The table is a ``Sequence[str]`` that compares equal to a list with the
+same lines, which keeps the List[str] contract of the sam module.
+"""
+
+from __future__ import annotations
+
+from bisect import bisect_right
+from collections.abc import Sequence
+from itertools import accumulate
+from typing import Iterable, Iterator, overload
+
+# Past this many pieces an edit flattens the table back into one piece.
+MAX_PIECES = 4096
+
+Piece = tuple[Sequence[str], int, int]  # (source lines, start, stop)
+
+
+class PieceTable(Sequence):
+    """An immutable sequence of lines; edits return a new table."""
+
+    __slots__ = ("_pieces", "_ends")
+
+    def __init__(self, lines: Iterable[str] = ()):
+        lines = list(lines)
+        self._pieces: list[Piece] = [(lines, 0, len(lines))] if lines else []
+        self._ends: list[int] = [len(lines)] if lines else []
+
+    @classmethod
+    def wrap(cls, lines: Iterable[str]) -> "PieceTable":
+        """Return ``lines`` if it is already a PieceTable, else a new one."""
+        return lines if isinstance(lines, cls) else cls(lines)
+
+    @classmethod
+    def view(cls, *sources: Sequence[str]) -> "PieceTable":
+        """A table of ``sources`` one after another, without copying them.
+
+        A source is read by index and slice and must not change below its
+        current length; tables among them lend their pieces.
+        """
+        pieces: list[Piece] = []
+        for source in sources:
+            if isinstance(source, cls):
+                pieces.extend(source._pieces)
+            elif len(source):
+                pieces.append((source, 0, len(source)))
+        return cls._from_pieces(pieces)
+
+    @classmethod
+    def _from_pieces(cls, pieces: list[Piece]) -> "PieceTable":
+        table = cls.__new__(cls)
+        table._pieces = pieces
+        table._ends = list(accumulate(stop - start for _, start, stop in pieces))
+        return table
+
+    def __len__(self) -> int:
+        return self._ends[-1] if self._ends else 0
+
+    def _locate(self, index: int) -> tuple[int, int]:
+        """Return (piece number, offset in piece) of line ``index``."""
+        k = bisect_right(self._ends, index)
+        return k, index - (self._ends[k - 1] if k else 0)
+
+    @overload
+    def __getitem__(self, index: int) -> str: ...
+
+    @overload
+    def __getitem__(self, index: slice) -> list[str]: ...
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self))
+            if step != 1:
+                return [self[i] for i in range(start, stop, step)]
+            return self._lines(start, stop)
+        n = len(self)
+        if index < 0:
+            index += n
+        if not 0 <= index < n:
+            raise IndexError("line index out of range")
+        k, offset = self._locate(index)
+        source, start, _ = self._pieces[k]
+        return source[start + offset]
+
+    def _lines(self, start: int, stop: int) -> list[str]:
+        """Lines start..stop-1 as a new list (0 <= start, stop <= len)."""
+        out: list[str] = []
+        if start >= stop:
+            return out
+        k, offset = self._locate(start)
+        need = stop - start
+        while need:
+            source, first, last = self._pieces[k]
+            taken = source[first + offset : min(last, first + offset + need)]
+            out.extend(taken)
+            need -= len(taken)
+            k, offset = k + 1, 0
+        return out
+
+    def __iter__(self) -> Iterator[str]:
+        for source, start, stop in self._pieces:
+            yield from source[start:stop]
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, PieceTable) and other._pieces == self._pieces:
+            return True
+        if isinstance(other, (PieceTable, list, tuple)):
+            return len(self) == len(other) and list(self) == list(other)
+        return NotImplemented
+
+    __hash__ = None  # type: ignore[assignment]
+
+    def __repr__(self) -> str:
+        return f"PieceTable({list(self)!r})"
+
+    def splice(self, start: int, stop: int, lines: Iterable[str] = ()) -> "PieceTable":
+        """Return a table with lines start..stop-1 replaced by ``lines``.
+
+        ``start`` and ``stop`` are normalised like list slice bounds.
+        """
+        n = len(self)
+        start, stop, _ = slice(start, stop).indices(n)
+        stop = max(start, stop)
+        new = list(lines)
+        pieces = self._pieces
+        k, offset = self._locate(start)
+        head = pieces[:k]
+        if offset:
+            source, first, _ = pieces[k]
+            head.append((source, first, first + offset))
+        k, offset = self._locate(stop)
+        tail = pieces[k + 1 :]
+        if k < len(pieces):
+            source, first, last = pieces[k]
+            if first + offset < last:
+                tail.insert(0, (source, first + offset, last))
+        if new:
+            head.append((new, 0, len(new)))
+        head.extend(tail)
+        if len(head) > MAX_PIECES:
+            return PieceTable(PieceTable._from_pieces(head))
+        return PieceTable._from_pieces(head)
+
+    def insert_lines(self, index: int, lines: Iterable[str]) -> "PieceTable":
+        """Return a table with ``lines`` inserted before line ``index``."""
+        return self.splice(index, index, lines)
+
+    def delete(self, start: int, stop: int) -> "PieceTable":
+        """Return a table without lines start..stop-1."""
+        return self.splice(start, stop)
+
+    def diff(self, other: "PieceTable") -> tuple[int, int, int]:
+        """Return (start, stop, other_stop) bounding where the tables differ.
+
+        Lines before ``start`` and from ``stop`` (``other_stop`` in other)
+        on are the same in both. Runs of shared pieces are skipped without
+        looking at their lines, so diffing a table against one made from
+        it by a few splices costs time in pieces plus changed lines.
+        """
+        n, m = len(self), len(other)
+        prefix = _common_run(self._pieces, other._pieces, min(n, m))
+        reverse_a = [(s, -stop, -start) for s, start, stop in reversed(self._pieces)]
+        reverse_b = [(s, -stop, -start) for s, start, stop in reversed(other._pieces)]
+        suffix = _common_run(reverse_a, reverse_b, min(n, m) - prefix, step=-1)
+        return prefix, n - suffix, m - suffix
+
+    @property
+    def piece_count(self) -> int:
+        return len(self._pieces)
+
+
+def _common_run(a: list[Piece], b: list[Piece], limit: int, step: int = 1) -> int:
+    """Count the lines two piece lists share from their start, up to ``limit``.
+
+    With ``step=-1`` the pieces are reversed ones, with negated bounds,
+    and lines are read backwards, which counts the common suffix.
+    """
+    count = i = j = 0
+    ia = ib = 0  # lines already used from a[i] and b[j]
+    while count < limit and i < len(a) and j < len(b):
+        sa, fa, la = a[i]
+        sb, fb, lb = b[j]
+        pa, pb = fa + ia, fb + ib
+        if sa is sb and pa == pb:
+            run = min(la - pa, lb - pb)
+        else:
+            run = 0
+            while (
+                pa + run < la
+                and pb + run < lb
+                and sa[step * (pa + run) - (step < 0)]
+                == sb[step * (pb + run) - (step < 0)]
+            ):
+                run += 1
+            if pa + run < la and pb + run < lb:
+                return min(count + run, limit)  # lines differ here
+        run = min(run, limit - count)
+        count += run
+        ia, ib = ia + run, ib + run
+        if fa + ia == la:
+            i, ia = i + 1, 0
+        if fb + ib == lb:
+            j, ib = j + 1, 0
+    return count
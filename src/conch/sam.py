@@ -2,21 +2,91 @@
 """
 IMPORTANT: This module implements a subset of the Sam text editor commands.
 IMPORTANT: Respect the contract: List[str] in, List[str] out
+(out is a PieceTable, a lazy list-like view that compares equal to lists)
 """
 import re
+from functools import lru_cache
+from typing import NamedTuple
+
+from .piecetable import PieceTable
+from .undo import UndoJournal
 
 
 class SamParseError(Exception):
     pass
 
 
-ac_pattern = r"^(\d*\.?,?\d*)([acis])(.)(.*)\3$"
-other_pattern = r"^(\d+\.?,?\d*)([abcdefimnqrstx]|\.)(.*)?$"
+# Commands sam understands; the range ones also take a,b  ,  /re/  and $.
+_commands = "acdimqst.xygvuU"
+RANGE_COMMANDS = frozenset("acdimqst.")
+LOOP_COMMANDS = frozenset("xygv")
+
+# One simple address: a line number, $, /regex/ (with \/ for a slash), or
+# a '.' that is not the last character (a final '.' is the dot command).
+_address = r"\d+|\$|/(?:[^/\\]|\\.)*/|\.(?!$)"
+# A whole command line, tokenized by a single match:
+# [left address][,[right address]][command][text]
+command_pattern = re.compile(
+    rf"({_address})?(?:(,)({_address})?)?([{_commands}]?)(.*)", re.S
+)
+# The rest of a looping command: x/re/command, likewise y, g and v.
+loop_body_pattern = re.compile(r"^([xygv])/((?:[^/\\]|\\.)*)/(.*)$", re.S)
+
+
+class Command(NamedTuple):
+    """A tokenized command line: [left][,][right]cmd text."""
+
+    left: str | None
+    comma: bool
+    right: str | None
+    cmd: str
+    text: str
+
+    @property
+    def has_range(self) -> bool:
+        """True if the address needs the range forms: a,b  ,  /re/  or $."""
+        ends = (self.left or "") + (self.right or "")
+        return self.comma or "$" in ends or "/" in ends
+
+
+def tokenize(s: str) -> Command | None:
+    """Split ``s`` into address, command and text with one regex match.
+
+    Returns None if no known command follows the address.
+    """
+    left, comma, right, cmd, text = command_pattern.match(s).groups()
+    if not cmd and text:
+        return None
+    return Command(left, comma is not None, right, cmd, text)
+
+
+REGEX_CACHE_SIZE = 128
+
+
+@lru_cache(maxsize=REGEX_CACHE_SIZE)
+def _compile(pattern: str) -> re.Pattern:
+    return re.compile(pattern)
+
+
+def compile_regex(pattern: str) -> re.Pattern:
+    """Compile a user regex (with \\/ for a slash), via a small LRU cache."""
+    try:
+        return _compile(pattern.replace("\\/", "/"))
+    except re.error as e:
+        raise SamParseError(f"Bad regex /{pattern}/: {e}")
+
+
+def _unwrap(text: str) -> str:
+    """Strip the delimiters of a c/text/ style argument, if it has them."""
+    if len(text) > 1 and text[0] == text[-1] and not text[0].isalnum():
+        return text[1:-1]
+    return text
 
 
 class Sam:
-    def __init__(self):
-        pass
+    def __init__(self, journal: UndoJournal | None = None):
+        # With a journal, edits are recorded and u/U undo and redo them.
+        self.journal = journal
 
     def is_sam_command(self, line: str) -> bool:
         """
@@ -25,72 +95,179 @@ class Sam:
         """
         if line.startswith("\\"):
             return False
-        if line == "$":
-            return True
-        if line == ".":
-            return True
-        if re.match(ac_pattern, line):
-            return True
-        if re.match(other_pattern, line):
+        command = tokenize(line)
+        return command is not None and self._is_valid(command)
+
+    def _is_valid(self, c: Command) -> bool:
+        """Whether a tokenized line is a command rather than plain text."""
+        if not c.cmd:
+            return c.left == "$" and not c.comma
+        if c.cmd in LOOP_COMMANDS:
+            return loop_body_pattern.match(c.cmd + c.text) is not None
+        if c.cmd in "uU":  # u, 3u, u3 or u 3
+            count = c.text.strip() or c.left or "1"
+            return not (c.comma or c.right) and count.isdigit()
+        if c.left or c.comma or c.right or c.cmd == ".":
             return True
-        return False
+        if c.cmd == "d":
+            return not c.text  # d on its own deletes the dot
+        # Without an address only delimited a/c/i/s count, e.g. c/text/
+        return c.cmd in "acis" and len(c.text) > 1 and c.text[0] == c.text[-1]
 
     def parse_command(self, s: str, dot: tuple[int, int]) -> tuple[int, str, str]:
         """
         Parse a Sam command string into its components.
         Returns a tuple of (address, command, text).
         """
-        # Special case for '^.'
-        if s.startswith("."):
+        command = tokenize(s)
+        if command is None or not command.cmd:
+            return -1, "", ""
+        return self._single(command, dot)
+
+    def _single(self, c: Command, dot: tuple[int, int]) -> tuple[int, str, str]:
+        """(address, command, text) of a command on one line."""
+        if c.left is None or c.left == ".":
             addr = dot[0] + 1  # Use current line number
-            cmd = s[1] if len(s) > 1 else "."
-            text = ""
-            if len(s) > 2:
-                text = s[2:]
-            return addr, cmd, text
-        if s == "$.":
-            addr = -1  # Use current line number
-            cmd = "."
-            text = ""
-            return addr, cmd, text
-
-        # Match against the command patterns
-        match = re.match(ac_pattern, s)
-        if match:
-            addr = int(match.group(1)) if match.group(1) else dot[0] + 1
-            cmd = match.group(2)
-            text = match.group(4) if match.group(4) else ""
-            if cmd == "s":
-                text = match.group(3) + match.group(4)
-            return addr, cmd, text
-
-        match = re.match(other_pattern, s)
-        if match:
-            addr = int(match.group(1)) if match.group(1) else -1
-            cmd = match.group(2)
-            text = match.group(3) if match.group(3) else ""
-            return addr, cmd, text
+        elif c.left.isdigit():
+            addr = int(c.left)
+        else:
+            addr = -1  # $ (and anything only a range can resolve)
+        text = c.text
+        if c.cmd in "aci" and len(text) > 1 and text[0] == text[-1]:
+            text = text[1:-1]  # a/text/ form
+        return addr, c.cmd, text
+
+    def parse_range(
+        self, s: str, buffer: list[str], dot: tuple[int, int]
+    ) -> tuple[tuple[int, int], str, str] | None:
+        """
+        Parse a command with a range address: a,b  ,  /re/  or $.
+        Returns ((start, stop), command, text) with start..stop-1 the
+        0-based lines addressed, or None if ``s`` has no such address
+        (plain N commands keep their single-line parse_command meaning).
+        """
+        c = tokenize(s)
+        if c is None or c.cmd not in RANGE_COMMANDS or not c.has_range:
+            return None
+        return self._range(c, buffer, dot), c.cmd, c.text
+
+    def _range(
+        self, c: Command, buffer: list[str], dot: tuple[int, int]
+    ) -> tuple[int, int]:
+        """Resolve [left][,][right] to a 0-based (start, stop) line range.
+
+        The right address may not start before the left one.
+        """
+        left, right, n = c.left, c.right, len(buffer)
+        if c.comma:
+            start = self._address(left, buffer, dot, dot[0])[0] if left else 0
+            end, stop = self._address(right, buffer, dot, start) if right else (n, n)
+        else:
+            start, stop = self._address(left or right, buffer, dot, dot[0])
+            end = start
+        if end < start:
+            raise SamParseError(f"Address out of order: {left},{right}")
+        return start, stop
 
-        return -1, "", ""
+    def _dot_range(self, buffer: list[str], dot: tuple[int, int]) -> tuple[int, int]:
+        """The lines a command without an address works on: the dot.
+
+        An empty dot (a,a) stands for line a, as for single-line commands.
+        """
+        n = len(buffer)
+        start = min(dot[0], n)
+        return start, min(max(dot[1], start + 1), n)
+
+    def _address(
+        self, token: str, buffer: list[str], dot: tuple[int, int], after: int
+    ) -> tuple[int, int]:
+        """Resolve one simple address to a 0-based (start, stop) line range.
+
+        /re/ finds the first matching line after line ``after``, wrapping
+        around to the top of the buffer.
+        """
+        n = len(buffer)
+        if token == "$":
+            return (max(n - 1, 0), n)
+        if token == ".":
+            line = min(dot[0], n)
+            return (line, min(line + 1, n))
+        if token.startswith("/"):
+            regex = compile_regex(token[1:-1])
+            for i in range(n):
+                line = (after + 1 + i) % n
+                if regex.search(buffer[line]):
+                    return (line, line + 1)
+            raise SamParseError(f"No match for {token}")
+        line = min(int(token), n)
+        return (max(line - 1, 0), line)
 
     def exec(
         self, command: str, buffer: list[str], dot: tuple[int, int]
-    ) -> tuple[list[str], tuple[int, int]]:
+    ) -> tuple[PieceTable, tuple[int, int]]:
         """
         Execute a Sam command on the given buffer.
         Supports commands of the form [addr]K[text], where addr is an integer and K is a single letter.
         Currently supports Nq: return buffer[:N].
+        The buffer may be a list or the PieceTable returned by an earlier
+        call; edits only touch the pieces around the lines they change.
         """
         if buffer is None:
             buffer = []
         if isinstance(buffer, str):
             buffer = buffer.splitlines()
-        assert isinstance(buffer, list), "Buffer must be a list of strings"
-        if len(buffer) > 0:
-            assert all(
-                isinstance(line, str) for line in buffer
-            ), "Buffer must contain only strings"
-        addr, cmd, text = self.parse_command(command, dot)
+        if not isinstance(buffer, PieceTable):
+            assert isinstance(buffer, list), "Buffer must be a list of strings"
+            if len(buffer) > 0:
+                assert all(
+                    isinstance(line, str) for line in buffer
+                ), "Buffer must contain only strings"
+            buffer = PieceTable(buffer)
+        c = tokenize(command)
+        if c is None or not self._is_valid(c):
+            return (buffer, (0, 0))
+        if c.cmd in "uU":
+            return self._undo(c, buffer, dot)
+        new_buffer, new_dot = self._run(c, buffer, dot)
+        if self.journal is not None:
+            self.journal.record(buffer, new_buffer, dot, new_dot)
+        return (new_buffer, new_dot)
+
+    def _undo(
+        self, c: Command, buffer: PieceTable, dot: tuple[int, int]
+    ) -> tuple[PieceTable, tuple[int, int]]:
+        """u undoes and U redoes the last (or last N) edits."""
+        if self.journal is None:
+            raise SamParseError("Undo is not enabled")
+        count = int(c.text.strip() or c.left or "1")
+        replay = self.journal.undo if c.cmd == "u" else self.journal.redo
+        try:
+            result = replay(buffer, count)
+        except ValueError as e:
+            raise SamParseError(f"Cannot {'undo' if c.cmd == 'u' else 'redo'}: {e}")
+        if result is None:
+            raise SamParseError(f"Nothing to {'undo' if c.cmd == 'u' else 'redo'}")
+        return result
+
+    def _run(
+        self, c: Command, buffer: PieceTable, dot: tuple[int, int]
+    ) -> tuple[PieceTable, tuple[int, int]]:
+        """Run an editing command (anything but u/U)."""
+        if c.cmd in LOOP_COMMANDS:
+            cmd, pattern, rest = loop_body_pattern.match(c.cmd + c.text).groups()
+            if c.left or c.comma or c.right:
+                rng = self._range(c, buffer, dot)
+            else:
+                rng = (0, len(buffer))  # loops default to the whole buffer
+            return self._exec_loop(buffer, rng, cmd, compile_regex(pattern), rest)
+        if c.cmd in RANGE_COMMANDS and c.has_range:
+            rng = self._range(c, buffer, dot)
+            return self._exec_range(buffer, dot, rng, c.cmd, c.text)
+        if c.cmd in RANGE_COMMANDS and c.left is None:
+            # No address: the command applies to the whole dot.
+            rng = self._dot_range(buffer, dot)
+            return self._exec_range(buffer, dot, rng, c.cmd, c.text)
+        addr, cmd, text = self._single(c, dot) if c.cmd else (-1, "", "")
         if addr == 0:
             addr = 1  # Adjust to 1-based index
         if addr < 0:
@@ -102,20 +279,19 @@ class Sam:
             return (buffer, (addr - 1, addr))
         if cmd == "a":
             lines = text.splitlines()
-            return (buffer[:addr] + lines + buffer[addr:], (addr, addr + len(lines)))
+            return (buffer.splice(addr, addr, lines), (addr, addr + len(lines)))
         if cmd == "c":
             lines = text.splitlines() if text else [""]
             return (
-                buffer[: addr - 1] + lines + buffer[addr:],
+                buffer.splice(addr - 1, addr, lines),
                 (addr - 1, addr - 1 + len(lines)),
             )
         if cmd == "d":
-            # TODO: delete multiple lines dot[0]:dot[1]
-            return (buffer[: addr - 1] + buffer[addr:], (addr - 1, addr - 1))
+            return (buffer.splice(addr - 1, addr), (addr - 1, addr - 1))
         if cmd == "i":
             lines = text.splitlines()
             return (
-                buffer[: addr - 1] + lines + buffer[addr - 1 :],
+                buffer.splice(addr - 1, addr - 1, lines),
                 (addr - 1, addr - 1 + len(lines)),
             )
         if cmd == "m":
@@ -123,13 +299,13 @@ class Sam:
             if 1 <= target <= len(buffer):
                 # Move the line at addr to the position at target
                 line_to_move = buffer[addr - 1]
-                new_buffer = buffer[: addr - 1] + buffer[addr:]
-                new_buffer.insert(target - 1, line_to_move)
+                new_buffer = buffer.splice(addr - 1, addr)
+                new_buffer = new_buffer.splice(target - 1, target - 1, [line_to_move])
                 return (new_buffer, (target - 1, target))
             return (buffer, dot)  # If target is out of bounds, return unchanged
 
         if cmd == "q":
-            return (buffer[:addr], (addr, addr))
+            return (buffer.splice(addr, len(buffer)), (addr, addr))
 
         if cmd == "s":
             if addr < 1 or addr > len(buffer):
@@ -139,10 +315,9 @@ class Sam:
             try:
                 delimiter = text[0]
                 pattern, replacement = text.split(delimiter)[1:3]
-                regex = re.compile(pattern)
-                new_buffer = buffer[: addr - 1] + buffer[addr:]
-                new_buffer.insert(addr - 1, regex.sub(replacement, buffer[addr - 1]))
-                return (new_buffer, (addr - 1, addr))
+                regex = compile_regex(pattern)
+                new_line = regex.sub(replacement, buffer[addr - 1])
+                return (buffer.splice(addr - 1, addr, [new_line]), (addr - 1, addr))
             # need some way to reflect the error in TUI
             except Exception as e:
                 raise SamParseError(f"Failed to parse command: {e}")
@@ -150,9 +325,128 @@ class Sam:
         if cmd == "t":
             target = int(text) if text else -1
             hold = buffer[addr - 1]
-            new_buffer = buffer[: target - 1] + [hold] + buffer[target - 1 :]
+            new_buffer = buffer.splice(target - 1, target - 1, [hold])
             return (new_buffer, (target, target))
 
         # Add more commands here as needed
         # If command not recognized, return buffer unchanged
         return (buffer, (0, 0))
+
+    def _exec_range(
+        self,
+        buffer: PieceTable,
+        dot: tuple[int, int],
+        rng: tuple[int, int],
+        cmd: str,
+        text: str,
+    ) -> tuple[PieceTable, tuple[int, int]]:
+        """Apply ``cmd`` to lines rng[0]..rng[1]-1 as a single splice."""
+        start, stop = rng
+        if cmd == ".":
+            return (buffer, (start, stop))
+        if cmd in "aci":
+            lines = _unwrap(text).splitlines()
+            if cmd == "a":
+                return (buffer.splice(stop, stop, lines), (stop, stop + len(lines)))
+            if cmd == "i":
+                return (buffer.splice(start, start, lines), (start, start + len(lines)))
+            lines = lines or [""]
+            return (buffer.splice(start, stop, lines), (start, start + len(lines)))
+        if cmd == "d":
+            return (buffer.splice(start, stop), (start, start))
+        if cmd == "q":
+            return (buffer.splice(stop, len(buffer)), (stop, stop))
+        if cmd == "s":
+            if not text:
+                return (buffer, dot)
+            try:
+                delimiter = text[0]
+                pattern, replacement = text.split(delimiter)[1:3]
+            except ValueError as e:
+                raise SamParseError(f"Failed to parse command: {e}")
+            regex = compile_regex(pattern)
+            lines = [regex.sub(replacement, line) for line in buffer[start:stop]]
+            return (buffer.splice(start, stop, lines), (start, stop))
+        # m and t take a 1-based target line; t may also copy past the end
+        target = int(text) if text.isdigit() else -1
+        if not 1 <= target <= len(buffer) + (cmd == "t"):
+            return (buffer, dot)
+        lines = buffer[start:stop]
+        if cmd == "t":
+            at = target - 1
+            return (buffer.splice(at, at, lines), (at, at + len(lines)))
+        # m: the target is a line of the buffer once the range is removed
+        rest = buffer.splice(start, stop)
+        at = min(target - 1, len(rest))
+        return (rest.splice(at, at, lines), (at, at + len(lines)))
+
+    def _exec_loop(
+        self,
+        buffer: PieceTable,
+        rng: tuple[int, int],
+        cmd: str,
+        regex: re.Pattern,
+        rest: str,
+    ) -> tuple[PieceTable, tuple[int, int]]:
+        """
+        Run a looping command over lines rng[0]..rng[1]-1 as one splice.
+        x and y work on the text of the range, as in sam: x runs ``rest``
+        on every match of ``regex``, y on the text between matches.
+        g and v work line by line, as in ed: ``rest`` runs on every line
+        that matches (g) or does not match (v); there ``d`` drops lines.
+        """
+        start, stop = rng
+        lines = buffer[start:stop]
+        if cmd in "xy":
+            text = self._loop_text(cmd, regex, rest, "\n".join(lines))
+            new_lines = text.split("\n") if lines or text else []
+        else:
+            new_lines = []
+            for line in lines:
+                if bool(regex.search(line)) != (cmd == "g"):
+                    new_lines.append(line)
+                elif rest != "d":
+                    new_lines.extend(self._apply(rest, line).split("\n"))
+        return (
+            buffer.splice(start, stop, new_lines),
+            (start, start + len(new_lines)),
+        )
+
+    def _loop_text(self, cmd: str, regex: re.Pattern, rest: str, text: str) -> str:
+        """Apply an x, y, g or v command to ``text``."""
+        if cmd == "x":
+            return regex.sub(lambda m: self._apply(rest, m.group(0)), text)
+        if cmd == "y":
+            out, pos = [], 0
+            for m in regex.finditer(text):
+                out.append(self._apply(rest, text[pos : m.start()]))
+                out.append(m.group(0))
+                pos = m.end()
+            out.append(self._apply(rest, text[pos:]))
+            return "".join(out)
+        if bool(regex.search(text)) == (cmd == "g"):
+            return self._apply(rest, text)
+        return text
+
+    def _apply(self, command: str, text: str) -> str:
+        """Apply the command inside a loop (c a i d s x y g v) to ``text``."""
+        cmd, arg = command[:1], command[1:]
+        if cmd == "c":
+            return _unwrap(arg)
+        if cmd == "a":
+            return text + _unwrap(arg)
+        if cmd == "i":
+            return _unwrap(arg) + text
+        if cmd == "d":
+            return ""
+        if cmd == "s" and arg:
+            try:
+                pattern, replacement = arg.split(arg[0])[1:3]
+            except ValueError:
+                raise SamParseError(f"Failed to parse command: {command}")
+            return compile_regex(pattern).sub(replacement, text)
+        match = loop_body_pattern.match(command)
+        if match:
+            cmd, pattern, rest = match.groups()
+            return self._loop_text(cmd, compile_regex(pattern), rest, text)
+        raise SamParseError(f"Unsupported command in loop: {command!r}")
@@ -6,11 +6,10 @@ Run this with `python -m conch.tui` or via the project's `main.py` entry.
 from __future__ import annotations
 
 import asyncio
+import re
 import sys
 import os
 import signal
-import shlex, subprocess
-from rich.text import Text
 from textual.app import App, ComposeResult
 from textual.containers import Vertical
 from textual.message import Message
@@ -19,22 +18,40 @@ from textual.widgets import Input, Static, Footer
 import textwrap
 from .anthropic import AnthropicClient, DEFAULT_MODEL
 from .openai_client import OpenAIClient, DEFAULT_OPENAI_MODEL
+from .fileindex import FileIndex
+from .jobs import JobManager
+from .piecetable import PieceTable
 from .sam import Sam, SamParseError
+from .undo import UndoJournal
 from .logview import LogView
 from .commands import (
+    command_cas,
     command_clear,
+    command_find,
+    command_gc,
     command_model,
+    command_fg,
     command_gf,
     command_help,
+    command_jobs,
+    command_jobw,
+    command_kill,
     command_lorem,
+    command_ls,
+    command_more,
+    command_open,
     command_paste,
     command_select,
     command_use,
-    command_w,
+    command_w_background,
 )
 from conch import commands
 
 
+# %{abcd1234} in input expands to the CAS object with that (abbreviated) hash.
+CAS_REF = re.compile(r"%\{([0-9a-fA-F]{4,64})\}")
+
+
 class Submit(Message):
     def __init__(self, sender, value: str) -> None:
         super().__init__(sender)
@@ -57,18 +74,43 @@ Available Commands:
   :lorem          - Add sample text for testing scrolling
   :paste          - Append clipboard contents to the log
   :use MODEL      - Set AI model for responses
+  :w              - Save the log to CAS
+  :cas            - Show CAS size and space saved
+  :gc [DAYS]      - Delete unpinned CAS objects older than DAYS (30)
+  :find WORDS     - Search saved AI responses and :w snapshots
 
 File Commands:
   < filename      - Read and display file contents (e.g., "< README.md")
   < directory     - List directory contents (e.g., "< src")
+  :ls [-l] [DIR]  - List DIR (default .); -l adds size and mtime columns
+  :more           - Show the next page of a long directory listing
   :gf             - Goto file at current dot
+  :open QUERY     - Fuzzy-find a file below the current directory and open it
 
 General Usage:
+  - %% in input is replaced by the lines in the dot
+  - %{HASH} is replaced by a saved CAS object (a hash prefix is enough)
   - Type commands in the input field at the bottom
   - Press Enter to execute
   - The log area shows command output and responses
   - Use scroll or arrow keys to navigate through log history
   - Use up/down arrow keys to move the dot and highlight the line
+  - !cmd (or sh mode) runs cmd in the background, streaming its output;
+    Esc cancels it (set CONCH_SHELL_TIMEOUT=N to kill it after N seconds)
+  - !cmd & runs cmd as a background job; many can run at once:
+    :jobs lists them, :fg [N] shows and follows job N's output,
+    :kill [N] stops it and :jobw [N] saves its output to CAS
+
+Ed Mode (sam):
+  Addresses: N, $, . (the dot), /re/ (next match), a,b and , (every line)
+  Commands:  a i c d s m t act on every addressed line in one edit
+    Example: "/^def/,$s/foo/bar/" or "2,5d"
+  Loops (whole buffer unless addressed), each a single edit:
+    x/re/cmd  - run cmd on every match     y/re/cmd - on text between matches
+    g/re/cmd  - run cmd on matching lines  v/re/cmd - on other lines
+    Example: "x/colour/c/color/" or "g/^#/d"
+  u [N], U [N] - undo / redo the last N edits (set CONCH_UNDO_CHECKPOINT=N
+                 to also save the buffer to CAS every N edits)
   
 AI Mode:
   Providers:
@@ -109,6 +151,7 @@ AI Mode:
         ("shift+up", "select_up", "Selection start up"),
         ("shift+down", "select_down", "Selection end down"),
         ("f9", "switch_mode", "Switch input mode"),
+        ("escape", "cancel_shell", "Cancel command"),
     ]
 
     placeholder = reactive("Ready.")
@@ -120,10 +163,26 @@ AI Mode:
         self.ai_model = None  # AI client, lazily initialized
         self.ai_provider = "anthropic"  # or "openai"
         self.ai_model_name = DEFAULT_MODEL  # Current model name
-        self.sam = Sam()
+        self.sam = Sam(
+            journal=UndoJournal(
+                checkpoint=commands.checkpoint_to_cas,
+                checkpoint_every=commands.undo_checkpoint_every(),
+            )
+        )
         self.buffer: list[str] = []  # Main text buffer for log contents
         self.dot = (0, 0)  # Cursor position in log
-        # TODO: Add history stack for undo functionality
+        # The buffer last shown in the log, and the log generation it
+        # was shown at; while both match, the log already displays it.
+        self._shown_buffer: list[str] | None = None
+        self._shown_generation = -1
+        # (entries, number shown, details) of a listing with pages left.
+        self.listing = None
+        self.pager = commands.CASPager()  # where old scrollback is paged out
+        # Files under the working directory, for :open; built on first use.
+        self.file_index = FileIndex()
+        self.index_task = None
+        self.shell_task: asyncio.Task | None = None  # running shell command
+        self.jobs = JobManager()  # commands run with a trailing &
 
     def switch_input_mode(self, mode: str) -> None:
         """Switch the input mode."""
@@ -139,7 +198,9 @@ AI Mode:
 
     def compose(self) -> ComposeResult:
         with Vertical():
-            self.log_view = LogView()
+            self.log_view = LogView(
+                scrollback=commands.scrollback_limit(), pager=self.pager
+            )
             self.log_view.border_title = "Conch TUI"
             yield self.log_view
             self.busy_indicator = Static(":idle", id="busy-indicator")
@@ -163,28 +224,37 @@ AI Mode:
         model_label = f"[{provider}:{model}]"
         self.log_view.border_title = f"Conch {model_label} {title}"
 
+    def _sync_buffer(self) -> None:
+        """Take the buffer from the log if the log changed since."""
+        if self.log_view.generation != self._shown_generation:
+            self.buffer = self.log_view.snapshot()
+            self._shown_buffer = self.buffer
+            self._shown_generation = self.log_view.generation
+
     def render_buffer(self) -> None:
-        """Render current buffer highlighting the dot."""
+        """Render current buffer highlighting the dot.
+
+        When the buffer changed the log is pointed at it, measuring only
+        the edited lines; moving the dot restyles just the lines entering
+        and leaving it.
+        """
         if not self.buffer:
             # Capture current log view lines if buffer is empty
-            self.buffer = [
-                getattr(line, "text", str(line)) for line in self.log_view.lines
-            ]
+            self._sync_buffer()
 
         mode_name = getattr(self, "input_mode", "sh")
         mode_color = next(
             (item["color"] for item in self.input_modes if item["name"] == mode_name),
             "#729789",
         )
-        self.log_view.clear()
+        if self.buffer is not self._shown_buffer:
+            self.log_view.show_lines(self.buffer)
+            self._shown_buffer = self.buffer
+            self._shown_generation = self.log_view.generation
+        else:
+            self._sync_buffer()
         # Highlight selection range if dot[1] > dot[0]
-        start = min(self.dot[0], self.dot[1])
-        end = max(self.dot[0], self.dot[1])
-        for i, line in enumerate(self.buffer):
-            if start <= i <= end:
-                self.log_view.write(Text(line, style=f"black on {mode_color}"))
-            else:
-                self.log_view.write(line)
+        self.log_view.set_highlight(self.dot[0], self.dot[1], f"black on {mode_color}")
         self.set_log_title()
         self._center_on_selection()
 
@@ -211,18 +281,21 @@ AI Mode:
 
     def action_delete_selection(self) -> None:
         """Delete the current selection."""
+        self._sync_buffer()
         start, end = self.dot
         if start != end:
-            self.buffer = self.buffer[:start] + self.buffer[end:]
+            before = PieceTable.wrap(self.buffer)
+            self.buffer = before.splice(start, end)
+            self.sam.journal.record(before, self.buffer, self.dot, (start, start))
             self.dot = (start, start)
             self.render_buffer()
 
     def move_dot(self, delta: int) -> None:
         """Move the dot up or down by delta lines and refresh display."""
-        self.buffer = [getattr(line, "text", str(line)) for line in self.log_view.lines]
-        if not self.buffer:
+        count = self.log_view.line_count
+        if not count:
             return
-        new_line = max(0, min(self.dot[0] + delta, len(self.buffer) - 1))
+        new_line = max(0, min(self.dot[0] + delta, count - 1))
         self.dot = (new_line, new_line)
         self.render_buffer()
 
@@ -242,7 +315,7 @@ AI Mode:
     def action_select_down(self) -> None:
         """Move the end of the selection down by one line."""
         start, end = self.dot
-        if end < len(self.buffer) - 1:
+        if end < self.log_view.line_count - 1:
             self.dot = (start, end + 1)
             self.render_buffer()
 
@@ -257,22 +330,49 @@ AI Mode:
         """Load a file or directory into the log view.
 
         Returns True on success, False if an error occurred."""
-        from .files import load_file, load_folder
+        from .files import (
+            LAZY_MIN,
+            PREVIEW_BYTES,
+            hex_preview,
+            is_binary_file,
+            load_file,
+            open_lines,
+        )
 
+        self.listing = None  # :more pages only the listing on screen
         if os.path.isdir(filename):
-            entries, error = load_folder(filename)
+            return commands.show_folder(self, filename)
+        elif is_binary_file(filename):
+            # Only the start of a binary file is read, as a hex dump.
+            lines, error = hex_preview(filename)
             self.log_view.clear()
-            dir_title = os.path.basename(filename) or filename
-            self.log_view.set_title(dir_title)
-            self.log_view.append(f"# {filename}")
+            self.log_view.set_title(os.path.basename(filename))
+            self.log_view.append(
+                f"# {filename} (binary, first {PREVIEW_BYTES // 1024} KB shown)"
+            )
             if error:
                 self.log_view.append(error)
                 self.log_view.append("§§§")
                 return False
-            for entry in entries:
-                self.log_view.append(entry)
+            self.log_view.extend(lines)
             self.log_view.append("§§§")
             return True
+        elif os.path.isfile(filename) and os.path.getsize(filename) >= LAZY_MIN:
+            # Big files are mapped and indexed in the background; the log
+            # shows lines as they are found.
+            mapped, error = open_lines(filename)
+            self.log_view.clear()
+            self.log_view.set_title(os.path.basename(filename))
+            self.log_view.append(f"# {filename}")
+            if error:
+                self.log_view.append(error)
+                self.log_view.append("§§§")
+                return False
+            self.log_view.show_file(mapped)
+            self.load_task = asyncio.get_running_loop().create_task(
+                commands.run_index(self, mapped)
+            )
+            return True
         else:
             lines, error = load_file(filename)
             self.log_view.clear()
@@ -283,8 +383,7 @@ AI Mode:
                 self.log_view.append(error)
                 self.log_view.append("§§§")
                 return False
-            for line in lines:
-                self.log_view.append(line)
+            self.log_view.extend(lines)
             self.log_view.append("§§§")
             return True
 
@@ -307,6 +406,12 @@ AI Mode:
         self.input_mode = "ai"
         self.switch_input_mode(self.input_mode)
 
+    def on_unmount(self) -> None:
+        # Unpin paged-out scrollback, then release the shared CAS
+        # connection(s) so the WAL is checkpointed.
+        self.pager.close()
+        commands.close_cas()
+
     async def on_input_submitted(self, event: Input.Submitted) -> None:
         value = event.value.strip()
         if not value:
@@ -335,7 +440,16 @@ AI Mode:
                     await res
                 return
             if cmd == "w":
-                command_w(self)
+                command_w_background(self)
+                return
+            if cmd == "cas":
+                command_cas(self)
+                return
+            if cmd == "gc" or cmd.startswith("gc "):
+                command_gc(self, cmd_line)
+                return
+            if cmd == "find" or cmd.startswith("find "):
+                command_find(self, cmd_line)
                 return
             if cmd in ("clear", "cls"):
                 command_clear(self)
@@ -358,6 +472,27 @@ AI Mode:
             if cmd == "gf":
                 command_gf(self)
                 return
+            if cmd == "ls" or cmd.startswith("ls "):
+                command_ls(self, cmd_line)
+                return
+            if cmd == "more":
+                command_more(self)
+                return
+            if cmd == "open" or cmd.startswith("open "):
+                command_open(self, cmd_line)
+                return
+            if cmd == "jobs":
+                command_jobs(self)
+                return
+            if cmd == "fg" or cmd.startswith("fg "):
+                command_fg(self, cmd_line)
+                return
+            if cmd == "kill" or cmd.startswith("kill "):
+                command_kill(self, cmd_line)
+                return
+            if cmd == "jobw" or cmd.startswith("jobw "):
+                command_jobw(self, cmd_line)
+                return
 
         # Interpolate the user input
         # unless the input is quoted
@@ -371,10 +506,11 @@ AI Mode:
             value = self.interpolate(value)
 
         if self.input_mode == "ed":
-            # Use Sam to process the command on the buffer
-            buffer = [getattr(line, "text", line) for line in self.log_view.lines]
+            # Use Sam to process the command on the buffer: the table shown
+            # in the log, or a snapshot of the log if it changed since.
+            self._sync_buffer()
             try:
-                self.buffer, self.dot = self.sam.exec(value, buffer, self.dot)
+                self.buffer, self.dot = self.sam.exec(value, self.buffer, self.dot)
                 self.render_buffer()
                 self.input.value = ""  # Clear input after command
             except SamParseError as e:
@@ -440,17 +576,23 @@ AI Mode:
                 self.input.value = ""
                 return
 
-            # Save successful responses to CAS and render output safely
+            # Save successful responses to CAS and render output safely.
+            # The write runs on the CAS writer thread; awaiting it keeps the
+            # hash line ahead of the response without blocking rendering.
             text_out = response or ""
             if response:
                 try:
-                    hash = commands.save_to_cas(response)
+                    hash = await commands.save_to_cas_async(
+                        response, source="ai", model=self.ai_model_name
+                    )
                     self.log_view.append(f"[model] {self.ai_model_name} -> {hash}")
                 except Exception as e:
                     self.log_view.append(f"[error] Failed to save to CAS: {e}")
-            for ln in (text_out.splitlines() or ["(no output)"]):
-                for wrapped_ln in (textwrap.wrap(ln, width=72) or [""]):
-                    self.log_view.append("  " + wrapped_ln)
+            self.log_view.extend(
+                "  " + wrapped_ln
+                for ln in (text_out.splitlines() or ["(no output)"])
+                for wrapped_ln in (textwrap.wrap(ln, width=72) or [""])
+            )
             self.set_busy(False)  # Reset busy state after getting AI response
 
         # clear input
@@ -482,21 +624,45 @@ AI Mode:
 
     # Shell command execution
     # TODO: operate on selection
-    def do_shell_command(self, command: str) -> None:
-        try:
-            args = shlex.split(command)
-            p = subprocess.run(args, capture_output=True, text=True, timeout=10)
-            out = p.stdout.strip() or p.stderr.strip() or f"(exit {p.returncode})"
-        except Exception as e:
-            out = f"[error] {e}"
-        for ln in out.splitlines() or ["(no output)"]:
-            self.log_view.append("  " + ln)
+    def do_shell_command(self, command: str) -> asyncio.Task | None:
+        """Start ``command`` in the background; its output streams into the log.
+
+        With a trailing ``&`` it runs as a job instead (see :jobs).
+        """
+        if command.rstrip().endswith("&"):
+            return commands.start_job(self, command.rstrip()[:-1].strip()).task
+        if self.shell_task is not None and not self.shell_task.done():
+            self.log_view.append(
+                "  [busy] a command is running (Esc cancels it; end a command"
+                " with & to run it as a job)"
+            )
+            return None
+        self.shell_task = asyncio.get_running_loop().create_task(
+            commands.run_shell(self, command, commands.shell_timeout())
+        )
+        return self.shell_task
+
+    def action_cancel_shell(self) -> None:
+        """Kill the running shell command, if there is one."""
+        if self.shell_task is not None and not self.shell_task.done():
+            self.shell_task.cancel()
 
     def interpolate(self, value: str) -> str:
         a = self.dot[0]
         b = self.dot[1]
         payload = self.log_view.get_lines(a, b)
-        return value.replace("%%", "\n" + "\n".join(payload) + "\n")
+        value = value.replace("%%", "\n" + "\n".join(payload) + "\n")
+        return CAS_REF.sub(self._expand_cas_ref, value)
+
+    def _expand_cas_ref(self, match: re.Match) -> str:
+        """Replace %{hash} with the CAS object it names, if there is one."""
+        try:
+            content = commands.get_cas().get(match.group(1))
+        except ValueError:
+            content = None
+        if content is None:
+            return match.group(0)
+        return "\n" + content + "\n"
 
 
 def main() -> None:
@@ -0,0 +1,104 @@
+"""undo.py: undo/redo journal for sam edits.
+
+Each edit is kept as a Delta: where it happened, the lines it removed
+and the lines it inserted. History memory therefore grows with the size
+of the changes, not of the buffer, and the journal keeps at most
+``depth`` of them. Optionally every Nth edit also hands the whole buffer
+to a ``checkpoint`` callable (the TUI writes it to CAS).
+"""
+
+from __future__ import annotations
+
+from collections import deque
+from typing import Any, Callable, NamedTuple
+
+from .piecetable import PieceTable
+
+UNDO_DEPTH = 1000
+
+Dot = tuple[int, int]
+
+
+class Delta(NamedTuple):
+    start: int
+    old: list[str]  # lines the edit removed
+    new: list[str]  # lines the edit inserted
+    dot_before: Dot
+    dot_after: Dot
+
+
+class UndoJournal:
+    """Bounded undo/redo stacks of edit deltas."""
+
+    def __init__(
+        self,
+        depth: int = UNDO_DEPTH,
+        checkpoint: Callable[[str], Any] | None = None,
+        checkpoint_every: int = 0,
+    ):
+        self._undo: deque[Delta] = deque(maxlen=depth)
+        self._redo: list[Delta] = []
+        self._checkpoint = checkpoint
+        self.checkpoint_every = checkpoint_every
+        self.edits = 0
+        # (edit number, whatever checkpoint returned) for each checkpoint.
+        self.checkpoints: list[tuple[int, Any]] = []
+
+    def __len__(self) -> int:
+        return len(self._undo)
+
+    @property
+    def can_redo(self) -> bool:
+        return bool(self._redo)
+
+    def record(
+        self, before: PieceTable, after: PieceTable, dot_before: Dot, dot_after: Dot
+    ) -> None:
+        """Remember the edit that turned ``before`` into ``after``."""
+        if before is after:
+            return
+        start, stop, new_stop = before.diff(after)
+        if start == stop == new_stop:
+            return
+        self._undo.append(
+            Delta(
+                start, before[start:stop], after[start:new_stop], dot_before, dot_after
+            )
+        )
+        self._redo.clear()
+        self.edits += 1
+        every = self.checkpoint_every
+        if self._checkpoint is not None and every and self.edits % every == 0:
+            handle = self._checkpoint("\n".join(after))
+            self.checkpoints.append((self.edits, handle))
+
+    def undo(self, buffer: PieceTable, count: int = 1) -> tuple[PieceTable, Dot] | None:
+        """Revert up to ``count`` edits; None if there is nothing to undo."""
+        return self._replay(buffer, count, self._undo, self._redo, undo=True)
+
+    def redo(self, buffer: PieceTable, count: int = 1) -> tuple[PieceTable, Dot] | None:
+        """Re-apply up to ``count`` undone edits; None if there are none."""
+        return self._replay(buffer, count, self._redo, self._undo, undo=False)
+
+    def _replay(
+        self,
+        buffer: PieceTable,
+        count: int,
+        source: deque[Delta] | list[Delta],
+        target: deque[Delta] | list[Delta],
+        undo: bool,
+    ) -> tuple[PieceTable, Dot] | None:
+        if not source:
+            return None
+        dot = None
+        for _ in range(min(count, len(source))):
+            delta = source[-1]
+            remove, insert = (delta.new, delta.old) if undo else (delta.old, delta.new)
+            stop = delta.start + len(remove)
+            if buffer[delta.start : stop] != remove:
+                raise ValueError("the buffer changed since that edit")
+            source.pop()
+            buffer = buffer.splice(delta.start, stop, insert)
+            target.append(delta)
+            dot = delta.dot_before if undo else delta.dot_after
+        return buffer, dot
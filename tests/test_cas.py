@@ -3,6 +3,8 @@ import shutil
 import tempfile
 import pytest
 import sqlite3
+import threading
+import time
 from conch.cas import CAS
 
 
@@ -15,7 +17,9 @@ def cas_root():
 
 @pytest.fixture
 def cas(cas_root):
-    return CAS(cas_root)
+    cas = CAS(cas_root)
+    yield cas
+    cas.close()
 
 
 def test_put_and_get(cas):
@@ -86,3 +90,516 @@ def test_list_pins(cas):
     hashes = {row[0] for row in rows}
     assert hash1 in hashes
     assert hash2 in hashes
+
+
+def test_index_uses_wal(cas):
+    conn = sqlite3.connect(os.path.join(cas.root, "index.db"))
+    mode = conn.execute("PRAGMA journal_mode").fetchone()[0]
+    conn.close()
+    assert mode.lower() == "wal"
+
+
+def test_pin_reuses_connection(cas):
+    conn = cas._conn
+    cas.pin(cas.put("one"))
+    cas.pin(cas.put("two"))
+    assert cas._conn is conn
+
+
+def test_pin_from_threads(cas):
+    hashes = [cas.put(f"thread {i}") for i in range(8)]
+    threads = [threading.Thread(target=cas.pin, args=(h,)) for h in hashes]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    rows = cas._conn.execute("SELECT hash FROM pinned").fetchall()
+    assert {row[0] for row in rows} == set(hashes)
+
+
+def test_close_is_idempotent(cas_root):
+    with CAS(cas_root) as cas:
+        cas.pin(cas.put("closing"))
+    cas.close()
+    assert cas._conn is None
+
+
+def test_put_many_matches_put(cas):
+    contents = ["alpha", "beta", "gamma"]
+    hashes = cas.put_many(contents)
+    assert hashes == [cas._hash_content(c) for c in contents]
+    assert cas.get_many(hashes) == contents
+
+
+def test_put_many_dedupes_and_indexes(cas):
+    hashes = cas.put_many(["same", "same", "other"])
+    assert hashes[0] == hashes[1]
+    rows = cas._conn.execute("SELECT hash, size FROM objects").fetchall()
+    assert sorted(rows) == sorted([(hashes[0], 4), (hashes[2], 5)])
+
+
+def test_put_many_validates_before_writing(cas):
+    with pytest.raises(ValueError):
+        cas.put_many(["fine", 42])
+    assert cas._conn.execute("SELECT COUNT(*) FROM objects").fetchone()[0] == 0
+    assert os.listdir(cas.store_dir) == []
+
+
+def test_get_many_missing(cas):
+    h = cas.put("present")
+    assert cas.get_many([h, "deadbeef" * 8]) == ["present", None]
+
+
+def test_known_hashes_survive_reopen(cas_root):
+    with CAS(cas_root) as first:
+        h = first.put("remember me")
+    with CAS(cas_root) as second:
+        assert h in second._known
+
+
+def test_put_stream_matches_put(cas):
+    chunks = ["first line\n", "second line\n", "ünïcode\n"]
+    expected = cas._hash_content("".join(chunks))
+    assert cas.put_stream(iter(chunks)) == expected
+    assert cas.get(expected) == "".join(chunks)
+
+
+def test_put_stream_lifts_size_limit(cas, tmp_path):
+    big = tmp_path / "big.log"
+    line = "x" * 1023 + "\n"
+    with open(big, "w", encoding="utf-8") as f:
+        for _ in range(5 * 1024):
+            f.write(line)
+    with open(big, "rb") as f:
+        hash_ = cas.put_stream(f)
+    assert sum(len(c) for c in cas.iter_chunks(hash_)) == 5 * 1024 * 1024
+    leftovers = [n for n in os.listdir(cas.store_dir) if n.startswith(".put-")]
+    assert leftovers == []
+
+
+def test_put_stream_handles_split_utf8(cas):
+    data = "größe".encode("utf-8")
+    chunks = [data[:3], data[3:]]  # splits the two-byte 'ö'
+    hash_ = cas.put_stream(chunks)
+    assert cas.get(hash_) == "größe"
+
+
+def test_put_stream_rejects_binary(cas):
+    with pytest.raises(ValueError):
+        cas.put_stream([b"\xff\xfe\x00"])
+    leftovers = [n for n in os.listdir(cas.store_dir) if n.startswith(".put-")]
+    assert leftovers == []
+
+
+def test_open_and_iter_chunks(cas):
+    hash_ = cas.put("abc\r\ndef")
+    with cas.open(hash_) as f:
+        assert f.read() == "abc\r\ndef"
+    assert list(cas.iter_chunks(hash_, size=3)) == ["abc", "\r\nd", "ef"]
+    with pytest.raises(FileNotFoundError):
+        cas.open("deadbeef" * 8)
+
+
+def _snapshot(n, start=0):
+    return "".join(
+        f"[{i:05d}] log line number {i} with some padding\n"
+        for i in range(start, start + n)
+    )
+
+
+def _store_files(cas):
+    return {
+        name
+        for prefix in os.listdir(cas.store_dir)
+        if not prefix.startswith(".")
+        for name in os.listdir(os.path.join(cas.store_dir, prefix))
+    }
+
+
+def test_large_put_is_chunked_and_reassembled(cas):
+    content = _snapshot(4000)
+    hash_ = cas.put(content)
+    assert hash_ == cas._hash_content(content)
+    assert hash_ in cas._manifests
+    assert cas.get(hash_) == content
+    assert "".join(cas.iter_chunks(hash_, size=1000)) == content
+
+
+def test_similar_snapshots_share_chunks(cas):
+    first = _snapshot(4000)
+    cas.put(first)
+    before = _store_files(cas)
+    # Insert a line near the top and append a few at the end.
+    lines = first.splitlines(keepends=True)
+    second = "".join(lines[:10] + ["an inserted line\n"] + lines[10:])
+    second += _snapshot(20, start=4000)
+    hash_ = cas.put(second)
+    added = _store_files(cas) - before
+    # The manifest plus a handful of changed chunks, not a full copy.
+    assert len(added) <= 4
+    assert cas.get(hash_) == second
+
+
+def test_split_chunks_respects_bounds():
+    from conch.cas import MAX_CHUNK, split_chunks
+
+    data = ("é" * 100_000 + "\n" + _snapshot(2000)).encode("utf-8")
+    chunks = split_chunks(data)
+    assert b"".join(chunks) == data
+    assert all(len(c) <= MAX_CHUNK for c in chunks)
+    for c in chunks:
+        c.decode("utf-8")  # never split inside a character
+
+
+def _codec(cas, hash_):
+    row = cas._conn.execute("SELECT codec FROM objects WHERE hash = ?", (hash_,))
+    return row.fetchone()[0]
+
+
+def _stored_size(cas, hash_):
+    return os.path.getsize(os.path.join(cas.store_dir, hash_[:2], hash_))
+
+
+def test_compressed_blob_roundtrip(cas):
+    content = "the same transcript line\n" * 500
+    hash_ = cas.put(content)
+    assert hash_ == cas._hash_content(content)
+    assert _codec(cas, hash_) == "gzip"
+    assert _stored_size(cas, hash_) < len(content) // 5
+    assert cas.get(hash_) == content
+    assert "".join(cas.iter_chunks(hash_, size=100)) == content
+
+
+def test_small_blobs_stay_raw(cas):
+    hash_ = cas.put("short")
+    assert _codec(cas, hash_) is None
+    assert _stored_size(cas, hash_) == len("short")
+
+
+def test_codec_recorded_in_index(cas_root):
+    content = "compress me please\n" * 200
+    with CAS(cas_root) as first:
+        hash_ = first.put(content)
+    with CAS(cas_root) as second:
+        assert _codec(second, hash_) == "gzip"
+        assert second.get(hash_) == content
+
+
+def test_chunked_objects_shared_between_instances(cas_root):
+    content = _snapshot(4000)
+    with CAS(cas_root) as reader, CAS(cas_root) as writer:
+        hash_ = writer.put(content)
+        writer.pin(hash_)
+        assert reader.get(hash_) == content
+        with reader.open(hash_) as f:
+            assert f.read() == content
+        # A collection run by the other instance keeps the pinned
+        # manifest's chunks, however old they are.
+        old = time.time() - 3600
+        for root, _, files in os.walk(reader.store_dir):
+            for name in files:
+                os.utime(os.path.join(root, name), (old, old))
+        reader._conn.execute("UPDATE objects SET created = ?", (old,))
+        reader._conn.commit()
+        assert reader.gc(keep_seconds=60) == (0, 0)
+    with CAS(cas_root) as fresh:
+        assert fresh.get(hash_) == content
+
+
+def test_compressed_objects_readable_by_another_instance(cas_root):
+    # Two sessions share a store: one reads what the other wrote after it
+    # opened the store, so the codec cannot come from its startup state.
+    small = "compress me please\n" * 100
+    with CAS(cas_root) as reader, CAS(cas_root) as writer:
+        h_gzip = writer.put(small)
+        h_stream = writer.put_stream([small, "more\n"])
+        assert reader.get(h_gzip) == small
+        with reader.open(h_stream) as f:
+            assert f.read() == small + "more\n"
+
+
+def test_compression_can_be_disabled(cas_root):
+    content = "keep me raw\n" * 200
+    with CAS(cas_root, compress=False) as cas:
+        hash_ = cas.put(content)
+        assert _stored_size(cas, hash_) == len(content)
+
+
+def test_put_stream_compresses(cas):
+    chunks = ["streamed log line\n"] * 10_000
+    hash_ = cas.put_stream(chunks)
+    assert _stored_size(cas, hash_) < 180_000 // 5
+    with cas.open(hash_) as f:
+        assert f.read() == "".join(chunks)
+
+
+def test_stats_reports_savings(cas):
+    cas.put("a transcript worth compressing\n" * 400)
+    cas.put(_snapshot(4000))
+    st = cas.stats()
+    assert st["objects"] == 2
+    assert st["stored"] < st["size"] // 3
+
+
+def _age(cas, hash_, seconds):
+    """Backdate an object's index row and file mtime by ``seconds``."""
+    then = time.time() - seconds
+    cas._conn.execute("UPDATE objects SET created = ? WHERE hash = ?", (then, hash_))
+    cas._conn.commit()
+    os.utime(os.path.join(cas.store_dir, hash_[:2], hash_), (then, then))
+
+
+def test_gc_keeps_pinned_and_recent(cas):
+    old = cas.put("old and unloved")
+    pinned = cas.put("old but pinned")
+    recent = cas.put("brand new")
+    _age(cas, old, 3600)
+    _age(cas, pinned, 3600)
+    cas.pin(pinned)
+    removed, freed = cas.gc(keep_seconds=60)
+    assert (removed, freed) == (1, len("old and unloved"))
+    assert cas.get(old) is None
+    assert cas.get(pinned) == "old but pinned"
+    assert cas.get(recent) == "brand new"
+    assert old not in cas._known
+    # A collected object can be stored again.
+    assert cas.get(cas.put("old and unloved")) == "old and unloved"
+
+
+def test_gc_keeps_objects_stored_again(cas):
+    # Re-saving existing text hands out its hash again, so it must count
+    # as new for collection even though nothing is rewritten.
+    small = cas.put("said twice")
+    big = cas.put(_snapshot(4000))
+    streamed = cas.put_stream(["streamed twice\n"])
+    for h in (small, big, streamed):
+        _age(cas, h, 3600)
+    assert cas.put("said twice") == small
+    assert cas.put(_snapshot(4000)) == big
+    assert cas.put_stream(["streamed twice\n"]) == streamed
+    assert cas.gc(keep_seconds=60) == (0, 0)
+    assert cas.get(small) == "said twice"
+    assert cas.get(big) == _snapshot(4000)
+    assert cas.get(streamed) == "streamed twice\n"
+
+
+def test_put_rewrites_objects_collected_by_another_instance(cas, cas_root):
+    small = cas.put("hello world")
+    big = cas.put(_snapshot(4000))
+    streamed = cas.put_stream(["streamed\n"])
+    with CAS(cas_root) as other:
+        assert other.gc(keep_seconds=-60)[0] >= 3
+    assert cas.put("hello world") == small
+    assert cas.put(_snapshot(4000)) == big
+    assert cas.put_stream(["streamed\n"]) == streamed
+    with CAS(cas_root) as fresh:
+        assert fresh.get(small) == "hello world"
+        assert fresh.get(big) == _snapshot(4000)
+        assert fresh.get(streamed) == "streamed\n"
+
+
+def test_gc_keeps_chunks_of_live_manifests(cas):
+    content = _snapshot(4000)
+    hash_ = cas.put(content)
+    for chunk in cas._manifest_chunks(hash_) + [hash_]:
+        _age(cas, chunk, 3600)
+    cas.pin(hash_)
+    assert cas.gc(keep_seconds=60) == (0, 0)
+    assert cas.get(hash_) == content
+
+
+def _fts_rows(cas):
+    return cas._conn.execute("SELECT COUNT(*) FROM text_index").fetchone()[0]
+
+
+def test_gc_removes_text_index_rows(cas):
+    if not cas._fts:
+        pytest.skip("SQLite without FTS5")
+    small = cas.put("short lived words")
+    big = cas.put(_snapshot(4000) + "chunked lived words\n")
+    keep = cas.put("words to keep")
+    assert _fts_rows(cas) == 3
+    for h in [small, big, *cas._manifest_chunks(big)]:
+        _age(cas, h, 3600)
+    assert cas.gc(keep_seconds=60)[0] >= 2
+    assert _fts_rows(cas) == 1
+    assert [r["hash"] for r in cas.find("words")] == [keep]
+
+
+def test_text_indexed_once_across_instances(cas_root):
+    with CAS(cas_root) as first, CAS(cas_root) as second:
+        if not first._fts:
+            pytest.skip("SQLite without FTS5")
+        first.put("shared words")
+        second.put("shared words")
+        assert _fts_rows(second) == 1
+
+
+def test_gc_runs_in_bounded_batches(cas):
+    hashes = cas.put_many([f"object {i}" for i in range(25)])
+    for h in hashes:
+        _age(cas, h, 3600)
+    batches = list(cas.gc_batches(keep_seconds=60, batch_size=10))
+    assert sum(n for n, _ in batches) == 25
+    assert all(n <= 10 for n, _ in batches)
+    assert cas.stats()["objects"] == 0
+
+
+def test_gc_reads_live_manifests_once(cas, monkeypatch):
+    content = _snapshot(4000)
+    pinned = cas.put(content)
+    cas.pin(pinned)
+    for h in cas.put_many([f"object {i}" for i in range(25)]):
+        _age(cas, h, 3600)
+    read = []
+    manifest_chunks = cas._manifest_chunks
+    monkeypatch.setattr(
+        cas, "_manifest_chunks", lambda h: read.append(h) or manifest_chunks(h)
+    )
+    batches = cas.gc_batches(keep_seconds=60, batch_size=5)
+    assert next(batches) == (0, 0)
+    late = cas.put("pinned during gc")
+    _age(cas, late, 3600)
+    cas.pin(late)
+    assert sum(n for n, _ in batches) == 25
+    assert read == [pinned]
+    assert cas.get(pinned) == content
+    assert cas.get(late) == "pinned during gc"
+
+
+def test_metadata_recorded(cas):
+    hash_ = cas.put("an answer", source="ai", model="claude-test")
+    row = cas._conn.execute(
+        "SELECT size, source, model FROM objects WHERE hash = ?", (hash_,)
+    ).fetchone()
+    assert row == (len("an answer"), "ai", "claude-test")
+
+
+def test_find_full_text(cas):
+    wal = cas.put("SQLite WAL mode keeps readers going", source="ai", model="m1")
+    cas.put("nothing to see here", source=":w")
+    big = cas.put(_snapshot(4000) + "needle in a chunked haystack\n", source=":w")
+    assert [r["hash"] for r in cas.find("wal readers")] == [wal]
+    assert cas.find("wal")[0]["model"] == "m1"
+    assert [r["hash"] for r in cas.find("needle haystack")] == [big]
+    assert cas.find("wal-mode OR") == []  # operators are taken literally
+    assert cas.find("   ") == []
+
+
+def test_find_streamed_objects_and_filter_by_source(cas, monkeypatch):
+    from conch import cas as cas_module
+
+    monkeypatch.setattr(cas_module, "INDEX_CHARS", 40)
+    streamed = cas.put_stream(
+        [b"a streamed needle ", "and more\n", "x" * 100, " beyond the index"],
+        source=":w",
+    )
+    page = cas.put("scrollback needle", source="scrollback")
+    assert {r["hash"] for r in cas.find("needle")} == {streamed, page}
+    assert [r["hash"] for r in cas.find("needle", sources=[":w", "ai"])] == [streamed]
+    if cas._fts:
+        assert cas.find("beyond") == []  # past INDEX_CHARS
+    _age(cas, streamed, 3600)
+    _age(cas, page, 3600)
+    cas.gc(keep_seconds=60)
+    assert cas.find("needle") == []
+    if cas._fts:
+        assert _fts_rows(cas) == 0
+
+
+def test_find_skips_collected_objects(cas):
+    hash_ = cas.put("ephemeral words")
+    _age(cas, hash_, 3600)
+    cas.gc(keep_seconds=60)
+    assert cas.find("ephemeral") == []
+
+
+def test_get_by_prefix(cas):
+    hash_ = cas.put("find me by prefix")
+    assert cas.resolve(hash_[:6]) == hash_
+    assert cas.get(hash_[:6]) == "find me by prefix"
+    assert cas.get(hash_[:8].upper()) == "find me by prefix"
+    with pytest.raises(ValueError):
+        cas.resolve(hash_[:3])
+    with pytest.raises(ValueError):
+        cas.resolve("zzzz")
+
+
+def test_ambiguous_prefix(cas):
+    rows = [("abcd" + c * 60, 1, 0.0) for c in "01"]
+    cas._conn.executemany(
+        "INSERT INTO objects (hash, size, created) VALUES (?, ?, ?)", rows
+    )
+    with pytest.raises(ValueError, match="Ambiguous"):
+        cas.resolve("abcd")
+    assert cas.resolve("abcd1") == "abcd" + "1" * 60
+
+
+def test_read_cache_serves_recent_objects(cas):
+    hash_ = cas.put("cached content")
+    os.remove(os.path.join(cas.store_dir, hash_[:2], hash_))
+    assert cas.get(hash_) == "cached content"
+
+
+def test_read_cache_evicts_by_size(cas_root):
+    with CAS(cas_root, cache_bytes=4096) as cas:
+        hashes = cas.put_many([f"{i:04d}" + "x" * 600 for i in range(20)])
+        assert cas._cache.size <= 4096
+        assert cas._cache.get(hashes[0]) is None
+        assert cas._cache.get(hashes[-1]) is not None
+        # Evicted objects still come back from disk.
+        assert cas.get(hashes[0]).startswith("0000")
+
+
+def test_reads_do_not_create_directories(cas):
+    for i in range(50):
+        assert cas.get(f"{i:02x}" + "0" * 62) is None
+    assert os.listdir(cas.store_dir) == []
+    cas.put("now a directory")
+    assert len(os.listdir(cas.store_dir)) == 1
+
+
+def test_read_path_microbenchmark(cas):
+    """Path lookup without mkdir should beat the old makedirs-per-call."""
+    import timeit
+
+    hash_ = cas.put("benchmark")
+    store = cas.store_dir
+
+    def old_get_path():
+        dir_path = os.path.join(store, hash_[:2])
+        os.makedirs(dir_path, exist_ok=True)
+        return os.path.join(dir_path, hash_)
+
+    old = min(timeit.repeat(old_get_path, number=2000, repeat=3))
+    new = min(timeit.repeat(lambda: cas._get_path(hash_), number=2000, repeat=3))
+    print(f"_get_path x2000: makedirs {old * 1e3:.2f}ms, lookup {new * 1e3:.2f}ms")
+    assert old_get_path() == cas._get_path(hash_)
+    assert new < old
+
+
+def test_async_cas_writes_in_background(cas):
+    import asyncio
+    from conch.cas import AsyncCAS
+
+    writer = AsyncCAS(cas)
+    futures = [writer.submit(f"queued {i}", source="ai") for i in range(20)]
+    writer.flush()
+    assert all(f.done() for f in futures)
+    assert cas.get(futures[-1].result()) == "queued 19"
+
+    async def awaited():
+        return await writer.put("awaited write", model="m")
+
+    hash_ = asyncio.run(awaited())
+    writer.close()
+    assert cas.get(hash_) == "awaited write"
+
+
+def test_async_cas_close_drains_queue(cas):
+    from conch.cas import AsyncCAS
+
+    writer = AsyncCAS(cas)
+    futures = [writer.submit("x" * 1000 + str(i)) for i in range(50)]
+    writer.close()
+    assert all(f.done() and f.exception() is None for f in futures)
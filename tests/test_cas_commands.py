@@ -0,0 +1,96 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(
+    0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "src"))
+)
+from conch import commands
+from conch.logview import LogView
+from conch.tui import ConchTUI
+
+
+@pytest.fixture(autouse=True)
+def _close_shared_cas():
+    yield
+    commands.close_cas()
+
+
+class DummyBusyIndicator:
+    def __init__(self):
+        self.message = None
+
+    def update(self, msg):
+        self.message = msg
+
+
+class DummyInput:
+    def __init__(self):
+        self.value = ""
+
+
+class DummyApp:
+    def __init__(self):
+        self.log_view = LogView()
+        self.busy_indicator = DummyBusyIndicator()
+        self.input = DummyInput()
+
+
+def test_command_cas_reports_savings(tmp_path, monkeypatch):
+    monkeypatch.setenv("CONCH_CAS_ROOT", str(tmp_path / "casdir"))
+    commands.save_to_cas("compressible line\n" * 1000)
+    appended = []
+    app = DummyApp()
+    app.log_view.append = appended.append
+    commands.command_cas(app)
+    assert appended[0].startswith("[cas] 1 objects, 18,000 bytes")
+    assert "% saved" in appended[0]
+
+
+def test_run_gc_reports_to_log(tmp_path, monkeypatch):
+    import asyncio
+
+    monkeypatch.setenv("CONCH_CAS_ROOT", str(tmp_path / "casdir"))
+    commands.save_to_cas("collect me")
+    appended = []
+    app = DummyApp()
+    app.log_view.append = appended.append
+    removed, _ = asyncio.run(commands.run_gc(app, keep_seconds=-60))
+    assert removed == 1
+    assert appended == ["[gc] removed 1 objects, freed 10 bytes"]
+    assert app.busy_indicator.message == ":idle"
+
+
+def test_command_find_lists_matches(tmp_path, monkeypatch):
+    monkeypatch.setenv("CONCH_CAS_ROOT", str(tmp_path / "casdir"))
+    h = commands.save_to_cas("first line\nthe answer is 42\n", source="ai", model="m")
+    appended = []
+    app = DummyApp()
+    app.log_view.append = appended.append
+    commands.command_find(app, "find answer")
+    assert appended[0] == "[find] 1 matches for 'answer'"
+    assert appended[1].startswith(f"  {h[:12]} ")
+    assert appended[1].endswith("ai m | the answer is 42")
+
+
+def test_command_find_skips_scrollback_and_needs_words(tmp_path, monkeypatch):
+    monkeypatch.setenv("CONCH_CAS_ROOT", str(tmp_path / "casdir"))
+    commands.save_to_cas("paged out answer", source="scrollback")
+    commands.save_to_cas("checkpointed answer", source="undo")
+    appended = []
+    app = DummyApp()
+    app.log_view.append = appended.append
+    commands.command_find(app, "find answer")
+    assert appended == ["[find] 0 matches for 'answer'"]
+    commands.command_find(app, "find")
+    assert appended[-1] == "Usage: :find WORDS"
+
+
+def test_interpolate_expands_cas_refs(tmp_path, monkeypatch):
+    monkeypatch.setenv("CONCH_CAS_ROOT", str(tmp_path / "casdir"))
+    h = commands.save_to_cas("remembered answer")
+    app = ConchTUI()
+    app.log_view = LogView()
+    assert app.interpolate(f"see %{{{h[:8]}}}") == "see \nremembered answer\n"
+    assert app.interpolate("keep %{0000} as is") == "keep %{0000} as is"
@@ -4,13 +4,23 @@ from types import SimpleNamespace
 
 sys.modules.setdefault("pyperclip", SimpleNamespace(paste=lambda: ""))
 
+from conch import commands
 from conch.commands import command_w
 
 
+@pytest.fixture(autouse=True)
+def _close_shared_cas():
+    yield
+    commands.close_cas()
+
+
 class DummyLogView:
     def __init__(self, lines=None):
         self.lines = lines or []
 
+    def snapshot(self):
+        return list(self.lines)
+
 
 class DummyBusyIndicator:
     def __init__(self):
@@ -55,3 +65,61 @@ def test_command_w_defaults_to_home(tmp_path, monkeypatch):
     assert app.busy_indicator.message and app.busy_indicator.message.startswith(
         "Saved: "
     )
+
+
+def test_save_to_cas_reuses_instance(tmp_path, monkeypatch):
+    monkeypatch.setenv("CONCH_CAS_ROOT", str(tmp_path / "casdir"))
+    first = commands.save_to_cas("first")
+    cas = commands.get_cas()
+    second = commands.save_to_cas("second")
+    assert commands.get_cas() is cas
+    assert cas.get(first) == "first"
+    assert cas.get(second) == "second"
+
+
+def test_command_w_background_reports_hash(tmp_path, monkeypatch):
+    import asyncio
+
+    monkeypatch.setenv("CONCH_CAS_ROOT", str(tmp_path / "casdir"))
+    app = DummyApp()
+
+    async def run():
+        fut = commands.command_w_background(app)
+        assert app.busy_indicator.message == "Saving..."
+        hash_ = await fut
+        await asyncio.sleep(0)
+        return hash_
+
+    hash_ = asyncio.run(run())
+    assert app.busy_indicator.message == f"Saved: {hash_}"
+    assert commands.get_cas().get(hash_) == "test content"
+
+
+def test_close_cas_flushes_pending_writes(tmp_path, monkeypatch):
+    monkeypatch.setenv("CONCH_CAS_ROOT", str(tmp_path / "casdir"))
+    fut = commands.get_async_cas().submit("written before exit")
+    commands.close_cas()
+    assert fut.done()
+    assert commands.get_cas().get(fut.result()) == "written before exit"
+
+
+def test_scrollback_limit_env(monkeypatch):
+    monkeypatch.delenv("CONCH_SCROLLBACK", raising=False)
+    assert commands.scrollback_limit() == commands.SCROLLBACK_LINES
+    monkeypatch.setenv("CONCH_SCROLLBACK", "500")
+    assert commands.scrollback_limit() == 500
+    monkeypatch.setenv("CONCH_SCROLLBACK", "0")
+    assert commands.scrollback_limit() is None
+
+
+def test_command_w_saves_logs_over_the_put_limit(tmp_path, monkeypatch):
+    from conch.logview import LogView
+
+    monkeypatch.setenv("CONCH_CAS_ROOT", str(tmp_path / "casdir"))
+    app = DummyApp()
+    app.log_view = LogView()
+    lines = [f"{i:08} " + "x" * 100 for i in range(50_000)]
+    app.log_view.extend(lines)
+    command_w(app)
+    hash_value = app.busy_indicator.message.removeprefix("Saved: ")
+    assert commands.get_cas().get(hash_value) == "\n".join(lines)
@@ -1,6 +1,8 @@
 import os
 import sys
 
+import pytest
+
 sys.path.insert(
     0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "src"))
 )
@@ -16,7 +18,7 @@ def test_arrow_keys_move_dot_and_update_title():
 
     app.action_move_down()
 
-    assert app.dot == (0, 0)
+    assert app.dot == (1, 1)
     # assert app.log_view.border_title == "Conch (2,1)"
     # line = app.log_view.lines[1]
     # assert getattr(line, "style", None) is not None
@@ -24,3 +26,124 @@ def test_arrow_keys_move_dot_and_update_title():
     app.action_move_up()
 
     assert app.dot == (0, 0)
+
+
+@pytest.mark.asyncio
+async def test_dot_move_restyles_only_changed_rows(monkeypatch, tmp_path):
+    monkeypatch.setenv("CONCH_CAS_ROOT", str(tmp_path / "casdir"))
+    app = ConchTUI()
+    async with app.run_test() as pilot:
+        app.input_mode = "sh"
+        for i in range(500):
+            app.log_view.append(f"line {i}")
+        await pilot.pause()
+        app.move_dot(1)
+
+        refreshed = []
+        app.log_view.refresh_lines = lambda first, count=1: refreshed.append(
+            (first, count)
+        )
+        app.log_view.clear = lambda: pytest.fail("dot move rewrote the log")
+        app.move_dot(1)
+
+        assert app.dot == (2, 2)
+        assert refreshed == [(1, 1), (2, 1)]
+        strip = app.log_view._render_line(2, 0, 40)
+        assert all(seg.style.bgcolor is not None for seg in strip)
+        plain = app.log_view._render_line(3, 0, 40)
+        assert plain.text.startswith("line 2")
+
+
+class CountingPager:
+    def __init__(self):
+        self.pages = {}
+
+    def spill(self, text):
+        self.pages[len(self.pages)] = text
+        return len(self.pages) - 1
+
+    def load(self, handle):
+        return self.pages[handle]
+
+    def release(self, handles):
+        pass
+
+
+def test_edit_does_not_rewrite_or_respill_the_log():
+    app = ConchTUI()
+    pager = CountingPager()
+    app.log_view = LogView(scrollback=100, pager=pager)
+    app.input_mode = "ed"
+    app.log_view.extend(f"line {i}" for i in range(1000))
+    app.render_buffer()
+    spilled = len(pager.pages)
+    assert spilled
+
+    app.log_view.extend = lambda lines: pytest.fail("edit rewrote the log")
+    app.buffer, app.dot = app.sam.exec("2d", app.buffer, app.dot)
+    app.render_buffer()
+
+    assert len(pager.pages) == spilled
+    assert app.log_view.line_count == 999
+    assert app.log_view.get_lines(0, 3) == ["line 0", "line 2", "line 3"]
+
+
+def test_dot_move_does_not_copy_the_log():
+    app = ConchTUI()
+    app.log_view = LogView()
+    app.input_mode = "sh"
+    app.log_view.extend(f"line {i}" for i in range(1000))
+    app.log_view.text_lines = lambda: pytest.fail("dot move copied the log")
+
+    app.move_dot(5)
+    app.log_view.append("more")
+    app.move_dot(5000)
+    assert app.dot == (1000, 1000)
+
+    app.input_mode = "ed"
+    app.buffer, app.dot = app.sam.exec("1d", app.buffer, app.dot)
+    app.render_buffer()
+    assert app.log_view.line_count == 1000
+    assert app.log_view.get_lines(-1) == ["more"]
+
+
+def test_edits_add_no_scrollback_pages_to_cas(monkeypatch, tmp_path):
+    from conch import commands
+
+    monkeypatch.setenv("CONCH_CAS_ROOT", str(tmp_path / "casdir"))
+    pager = commands.CASPager()
+    app = ConchTUI()
+    app.log_view = LogView(scrollback=10, pager=pager)
+    app.input_mode = "ed"
+    app.log_view.extend(f"line {i}" for i in range(100))
+    app.render_buffer()
+
+    def objects():
+        commands.get_async_cas().flush()
+        sql = "SELECT COUNT(*) FROM objects"
+        return commands.get_cas()._conn.execute(sql).fetchone()[0]
+
+    before = objects()
+    for command in ("2d", "5d", "1d"):
+        app.buffer, app.dot = app.sam.exec(command, app.buffer, app.dot)
+        app.render_buffer()
+    assert objects() == before
+    assert app.log_view.get_lines(0, 2) == ["line 2", "line 3"]
+    pager.close()
+    commands.close_cas()
+
+
+def test_edits_share_one_scrollback_limit():
+    app = ConchTUI()
+    app.log_view = LogView(scrollback=1000, pager=CountingPager())
+    app.input_mode = "ed"
+    for i in range(5):
+        app.log_view.extend(f"round {i} line {j}" for j in range(800))
+        app.render_buffer()
+        app.buffer, app.dot = app.sam.exec("1d", app.buffer, app.dot)
+        app.render_buffer()
+    lines = app.log_view._lines
+    assert app.log_view._store.tail.store is lines
+    assert len(lines) - lines.spilled <= 1000
+    assert app.log_view.line_count == 5 * 800 - 5
+    assert app.log_view.get_lines(-1) == ["round 4 line 799"]
@@ -0,0 +1,110 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(
+    0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "src"))
+)
+from conch import commands
+from conch.fileindex import FileIndex, is_ignored, parse_gitignore
+from conch.logview import LogView
+
+
+def _tree(root, paths):
+    for p in paths:
+        path = root / p
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(p)
+
+
+def test_gitignore_rules():
+    rules = parse_gitignore("*.pyc\nbuild/\n/top.txt\n!keep.pyc\ndocs/*.md\n")
+    assert is_ignored(rules, "a/b.pyc", False)
+    assert not is_ignored(rules, "a/keep.pyc", False)
+    assert is_ignored(rules, "x/build", True)
+    assert not is_ignored(rules, "x/build", False)
+    assert is_ignored(rules, "top.txt", False)
+    assert not is_ignored(rules, "sub/top.txt", False)
+    assert is_ignored(rules, "docs/a.md", False)
+    assert not is_ignored(rules, "docs/sub/a.md", False)
+    nested = parse_gitignore("*.log", base="sub")
+    assert is_ignored(nested, "sub/x/a.log", False)
+    assert not is_ignored(nested, "a.log", False)
+
+
+def test_index_honours_gitignore(tmp_path):
+    _tree(
+        tmp_path,
+        ["src/app.py", "src/app.pyc", "build/out.txt", ".git/HEAD", "sub/a.log"],
+    )
+    (tmp_path / ".gitignore").write_text("*.pyc\nbuild/\n")
+    (tmp_path / "sub" / ".gitignore").write_text("*.log\n")
+    index = FileIndex(str(tmp_path)).scan()
+    assert sorted(index.paths) == [".gitignore", "src/app.py", "sub/.gitignore"]
+
+
+def test_rescan_only_relists_changed_dirs(tmp_path, monkeypatch):
+    _tree(tmp_path, ["a/one.py", "b/two.py"])
+    index = FileIndex(str(tmp_path)).scan()
+    listed = []
+    scandir = os.scandir
+    monkeypatch.setattr(
+        os, "scandir", lambda path: listed.append(path) or scandir(path)
+    )
+    (tmp_path / "b" / "three.py").write_text("")
+    os.utime(tmp_path / "b", ns=(0, 1))  # a different mtime, however coarse
+    index.scan()
+    assert listed == [os.path.join(str(tmp_path), "b")]
+    assert sorted(index.paths) == ["a/one.py", "b/three.py", "b/two.py"]
+
+
+def test_rescan_applies_edited_gitignore(tmp_path):
+    _tree(tmp_path, ["sub/a.log", "sub/deep/b.log", "c.py"])
+    ignore = tmp_path / ".gitignore"
+    ignore.write_text("*.pyc\n")
+    index = FileIndex(str(tmp_path)).scan()
+    assert "sub/deep/b.log" in index.paths
+    ignore.write_text("*.pyc\n*.log\n")
+    os.utime(ignore, ns=(0, 1))  # a different mtime, however coarse
+    index.scan()
+    assert sorted(index.paths) == [".gitignore", "c.py"]
+    ignore.write_text("*.pyc\n")
+    os.utime(ignore, ns=(0, 2))
+    index.scan()
+    assert "sub/deep/b.log" in index.paths
+
+
+def test_find_is_fuzzy_and_prefers_names(tmp_path):
+    _tree(tmp_path, ["src/logview.py", "tests/test_logview.py", "lib/long/view.py"])
+    index = FileIndex(str(tmp_path)).scan()
+    assert index.find("lgvw")[:2] == ["src/logview.py", "tests/test_logview.py"]
+    assert index.find("logview.py")[0] == "src/logview.py"
+    assert index.find("zzz") == []
+
+
+class _App:
+    def __init__(self, root):
+        self.log_view = LogView()
+        self.busy_indicator = type("B", (), {"update": lambda self, m: None})()
+        self.input = type("I", (), {"value": ""})()
+        self.file_index = FileIndex(root)
+        self.opened = []
+
+    def _read_path(self, path):
+        self.opened.append(path)
+
+
+@pytest.mark.asyncio
+async def test_open_opens_single_match_or_lists(tmp_path):
+    _tree(tmp_path, ["src/logview.py", "tests/test_logview.py", "README.md"])
+    app = _App(str(tmp_path))
+    await commands.command_open(app, "open readme")
+    assert app.opened == [os.path.join(str(tmp_path), "README.md")]
+    await commands.command_open(app, "open logview")
+    assert app.log_view.text_lines()[-3:] == [
+        "[open] 2 matches for 'logview' (:gf opens one)",
+        f"  {os.path.join(str(tmp_path), 'src/logview.py')}",
+        f"  {os.path.join(str(tmp_path), 'tests/test_logview.py')}",
+    ]
+    await app.index_task
@@ -59,3 +59,61 @@ def test_read_folder(tmp_path):
     entries, err = fs.load_folder(dirpath)
     assert entries == ["file1.txt", "file2.txt"]
     assert err is None
+
+
+def test_read_folder_details(tmp_path):
+    (tmp_path / "b.txt").write_text("x" * 1234)
+    (tmp_path / "a").mkdir()
+    entries, err = fs.load_folder(tmp_path, details=True)
+    assert err is None
+    assert entries[0].split()[0] == "-"
+    assert entries[0].endswith("  a/")
+    assert entries[1].split()[0] == "1,234"
+    assert entries[1].endswith("  b.txt")
+
+
+def test_ls_pages_long_listings(tmp_path, monkeypatch):
+    from types import SimpleNamespace
+
+    from conch import commands
+
+    for i in range(25):
+        (tmp_path / f"f{i:02}").write_text("")
+    monkeypatch.setattr(commands, "FOLDER_PAGE", 10)
+    app = SimpleNamespace(log_view=LogView(), input=SimpleNamespace(value=""))
+    commands.command_ls(app, f"ls {tmp_path}")
+    lines = app.log_view.text_lines()
+    assert lines[0] == f"# {tmp_path}"
+    assert lines[1:11] == [f"f{i:02}" for i in range(10)]
+    assert lines[-1] == "... 15 more entries (:more)"
+    commands.command_more(app)
+    commands.command_more(app)
+    lines = app.log_view.text_lines()
+    assert lines[-6:] == ["f20", "f21", "f22", "f23", "f24", "§§§"]
+    assert app.listing is None
+    commands.command_more(app)
+    assert app.log_view.text_lines()[-1] == "Nothing more to list"
+
+
+def test_more_forgets_listings_no_longer_shown(tmp_path, monkeypatch):
+    from types import SimpleNamespace
+
+    from conch import commands
+
+    for i in range(25):
+        (tmp_path / f"f{i:02}").write_text("")
+    monkeypatch.setattr(commands, "FOLDER_PAGE", 10)
+    app = ConchTUI()
+    app.log_view = LogView()
+    app.input = SimpleNamespace(value="")
+
+    commands.command_ls(app, f"ls {tmp_path}")
+    commands.command_clear(app)
+    commands.command_more(app)
+    assert app.log_view.text_lines() == ["Nothing more to list"]
+
+    commands.command_ls(app, f"ls {tmp_path}")
+    assert app._read_path(str(tmp_path / "f00"))
+    commands.command_more(app)
+    assert app.log_view.text_lines()[-1] == "Nothing more to list"
+    assert "f10" not in app.log_view.text_lines()
@@ -33,9 +33,9 @@ def test_gf_opens_file_from_listing(tmp_path):
     app.log_view.append(f"# {d}")
     app.log_view.append("file.txt")
     app.log_view.append("§§§")
-    app.dot = (1, 0)
+    app.dot = (1, 1)
 
-    asyncio.run(app.on_input_submitted(DummyEvent("/gf")))
+    asyncio.run(app.on_input_submitted(DummyEvent(":gf")))
 
-    lines = [line.plain for line in app.log_view.lines]
-    assert len(lines) == 0
+    lines = [line.text for line in app.log_view.lines]
+    assert lines == [f"# {f}", "hello", "§§§"]
@@ -0,0 +1,104 @@
+import asyncio
+import os
+import sys
+
+import pytest
+
+sys.path.insert(
+    0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "src"))
+)
+from conch import commands
+from conch.jobs import Job, JobManager
+from conch.logview import LogView
+
+
+class _Busy:
+    def __init__(self):
+        self.message = None
+
+    def update(self, msg):
+        self.message = msg
+
+
+class _App:
+    def __init__(self):
+        self.log_view = LogView()
+        self.busy_indicator = _Busy()
+        self.input = type("I", (), {"value": ""})()
+        self.jobs = JobManager()
+
+
+def _py(code):
+    return f'"{sys.executable}" -c "{code}"'
+
+
+def test_job_buffer_is_bounded():
+    job = Job(1, "cmd", limit=3)
+    seen = []
+    job.follow = seen.extend
+    job.write(["a", "b"])
+    job.write(["c", "d", "e"])
+    assert list(job.output) == ["c", "d", "e"]
+    assert job.dropped == 2
+    assert seen == ["a", "b", "c", "d", "e"]
+    job.finish("exit 0", 0)
+    assert job.follow is None and not job.running
+
+
+def test_job_table_forgets_old_finished_jobs():
+    jobs = JobManager(finished=2)
+    for i in range(4):
+        jobs.add(f"cmd {i}").finish("exit 0", 0)
+    running = jobs.add("cmd 4")
+    assert [j.number for j in jobs] == [3, 4, 5]
+    assert jobs.get() is running
+    assert jobs.get(1) is None
+    assert jobs.status() == ":jobs 1 running"
+
+
+@pytest.mark.asyncio
+async def test_jobs_run_concurrently_into_their_own_buffers():
+    app = _App()
+    one = commands.start_job(app, _py("print('one')"))
+    two = commands.start_job(app, _py("print('two')"))
+    assert app.busy_indicator.message == ":jobs 2 running"
+    assert await one.task == 0 and await two.task == 0
+    assert list(one.output) == ["one"] and list(two.output) == ["two"]
+    lines = app.log_view.text_lines()
+    assert lines[0] == f"[1] started {one.command}"
+    assert one.describe() in lines and two.describe() in lines
+    assert "one" not in lines and "  one" not in lines
+    assert app.busy_indicator.message == ":idle"
+
+    commands.command_fg(app, "fg 2")
+    assert app.log_view.text_lines()[-2:] == [f"# {two.describe()}", "  two"]
+
+
+@pytest.mark.asyncio
+async def test_fg_follows_and_kill_stops_a_job():
+    app = _App()
+    slow = _py("import time; print('tick', flush=True); time.sleep(30)")
+    job = commands.start_job(app, slow)
+    while not job.output:
+        await asyncio.sleep(0.01)
+    commands.command_fg(app, "fg")
+    assert app.log_view.text_lines()[-1] == "  tick"
+    commands.command_kill(app, f"kill {job.number}")
+    with pytest.raises(asyncio.CancelledError):
+        await job.task
+    assert job.state == "cancelled"
+    assert app.log_view.text_lines()[-1] == job.describe()
+    commands.command_kill(app, "kill 9")
+    assert app.log_view.text_lines()[-1] == "No such job: 9"
+
+
+@pytest.mark.asyncio
+async def test_jobw_saves_output_to_cas(tmp_path, monkeypatch):
+    monkeypatch.setenv("CONCH_CAS_ROOT", str(tmp_path / "casdir"))
+    app = _App()
+    job = commands.start_job(app, _py("print('saved'); print('lines')"))
+    await job.task
+    digest = await commands.command_jobw(app, "jobw")
+    assert commands.get_cas().get(digest) == "saved\nlines"
+    assert app.busy_indicator.message == f"Saved: {digest}"
+    commands.close_cas()
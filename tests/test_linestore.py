@@ -0,0 +1,175 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(
+    0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "src"))
+)
+from conch.linestore import LineStore
+
+
+def test_append_and_index():
+    store = LineStore(["alpha", "", "gämma"])
+    store.append("delta")
+    assert len(store) == 4
+    assert store[0] == "alpha"
+    assert store[1] == ""
+    assert store[2] == "gämma"
+    assert store[-1] == "delta"
+    with pytest.raises(IndexError):
+        store[4]
+
+
+def test_slices_and_text():
+    lines = [f"line {i}" for i in range(10)]
+    store = LineStore(lines)
+    assert store[2:5] == lines[2:5]
+    assert store[:] == lines
+    assert store[8:20] == lines[8:20]
+    assert store[5:2] == []
+    assert store[::3] == lines[::3]
+    assert store.text() == "\n".join(lines)
+    assert list(store) == lines
+
+
+def test_clear_and_empty():
+    store = LineStore(["x"])
+    store.clear()
+    assert len(store) == 0
+    assert store[:] == []
+    assert store.text() == ""
+
+
+def test_compact_storage():
+    store = LineStore("x" * 40 for _ in range(10_000))
+    # 41 bytes of text plus an 8-byte offset per line.
+    assert store.nbytes == 10_000 * 49
+
+
+class DictPager:
+    def __init__(self):
+        self.pages = {}
+        self.loads = 0
+
+    def spill(self, text):
+        handle = len(self.pages)
+        self.pages[handle] = text
+        return handle
+
+    def load(self, handle):
+        self.loads += 1
+        return self.pages[handle]
+
+    def release(self, handles):
+        for handle in handles:
+            del self.pages[handle]
+
+
+def test_limit_spills_old_lines_to_pager():
+    pager = DictPager()
+    lines = [f"line {i} ü" for i in range(5000)]
+    store = LineStore(lines, limit=1000, pager=pager)
+    assert len(store) == 5000
+    assert store.spilled >= 4000
+    assert len(store) - store.spilled <= 1000
+    assert store[0] == "line 0 ü"
+    assert store[2500] == "line 2500 ü"
+    assert store[-1] == "line 4999 ü"
+    assert store[990:1010] == lines[990:1010]
+    assert store[:] == lines
+    assert store.text() == "\n".join(lines)
+
+
+def test_spilled_pages_are_cached():
+    pager = DictPager()
+    store = LineStore((str(i) for i in range(100)), limit=10, pager=pager)
+    for _ in range(3):
+        assert store[0] == "0"
+        assert store[5] == "5"
+    assert pager.loads == 1
+
+
+def test_pages_released_on_clear_and_collection():
+    import gc
+
+    pager = DictPager()
+    store = LineStore((str(i) for i in range(100)), limit=10, pager=pager)
+    assert len(pager.pages) == 9
+    store.clear()
+    assert pager.pages == {}
+    store.extend(str(i) for i in range(50))
+    assert len(pager.pages) == 4
+    del store
+    gc.collect()
+    assert pager.pages == {}
+
+
+def test_limit_needs_a_pager():
+    store = LineStore((str(i) for i in range(100)), limit=10)
+    assert store.spilled == 0
+    assert store[:] == [str(i) for i in range(100)]
+
+
+def test_cas_pages_survive_gc_until_released(monkeypatch, tmp_path):
+    from conch import commands
+
+    monkeypatch.setenv("CONCH_CAS_ROOT", str(tmp_path / "casdir"))
+    pager = commands.CASPager()
+    store = LineStore((f"old line {i}" for i in range(100)), limit=10, pager=pager)
+    commands.get_async_cas().flush()
+    cas = commands.get_cas()
+    assert cas.gc(keep_seconds=0) == (0, 0)
+    assert store[0] == "old line 0"
+    store.clear()
+    commands.get_async_cas().flush()
+    assert cas.gc(keep_seconds=0)[0] > 0
+    pager.close()
+    commands.close_cas()
+
+
+def test_scrollback_spills_to_cas(monkeypatch, tmp_path):
+    from conch import commands
+    from conch.logview import LogView
+
+    monkeypatch.setenv("CONCH_CAS_ROOT", str(tmp_path / "casdir"))
+    pager = commands.CASPager()
+    log = LogView(scrollback=100, pager=pager)
+    lines = [f"output {i}" for i in range(1000)]
+    for ln in lines:
+        log.write(ln)
+    assert log.line_count == 1000
+    assert log._store.spilled >= 900
+    assert log.get_lines(0, 3) == lines[0:3]
+    assert log.text_lines() == lines
+    commands.get_async_cas().flush()
+    assert commands.get_cas().find("output 5")
+    pager.close()
+    commands.close_cas()
+
+
+def test_scrollback_pages_over_the_put_limit(monkeypatch, tmp_path):
+    from conch import commands
+    from conch.cas import MAX_SIZE
+    from conch.logview import LogView
+
+    monkeypatch.setenv("CONCH_CAS_ROOT", str(tmp_path / "casdir"))
+    pager = commands.CASPager()
+    log = LogView(scrollback=4, pager=pager)
+    lines = [str(i) * (MAX_SIZE // 4 + 1) for i in range(8)]
+    log.extend(lines)
+    assert log._store.spilled == 4
+    assert log.get_lines(0, 2) == lines[0:2]
+    pager.close()
+    commands.close_cas()
+
+
+def test_pager_close_without_spills_leaves_no_cas(monkeypatch, tmp_path):
+    from conch import commands
+
+    root = tmp_path / "casdir"
+    monkeypatch.setenv("CONCH_CAS_ROOT", str(root))
+    pager = commands.CASPager()
+    LineStore(["a", "b"], limit=10, pager=pager)
+    pager.close()
+    assert not root.exists()
@@ -10,6 +10,7 @@ sys.path.insert(
     0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "src"))
 )
 from conch.logview import LogView
+from conch.piecetable import PieceTable
 
 
 def test_get_lines_basic():
@@ -75,3 +76,79 @@ def test_logview_append_get_lines():
     assert lv.get_lines(1, 3) == ["line2", "line3"]
     assert lv.get_lines(0, 3) == ["line1", "line2", "line3"]
     assert lv.get_lines(1, 1) == ["line2"]
+
+
+def test_logview_text_helpers():
+    lv = LogView()
+    lv.append("one\ntwo")
+    lv.write(Text("three"))
+    assert lv.line_count == 3
+    assert lv.text_lines() == ["one", "two", "three"]
+    assert lv.get_text() == "one\ntwo\nthree"
+    assert lv.lines[1].text == "two"
+    assert [seg.text for seg in lv.lines[1:]] == ["two", "three"]
+
+
+@pytest.mark.asyncio
+async def test_logview_renders_only_visible_rows():
+    from textual.app import App, ComposeResult
+
+    class LogApp(App):
+        def compose(self) -> ComposeResult:
+            yield LogView(id="log")
+
+    async with LogApp().run_test(size=(40, 10)) as pilot:
+        log = pilot.app.query_one("#log", LogView)
+        for i in range(10_000):
+            log.append(f"row {i}")
+        await pilot.pause()
+        assert log.virtual_size.height == 10_000
+        log.scroll_to(y=5000, animate=False)
+        await pilot.pause()
+        assert log.render_line(0).text.startswith("row 5000")
+
+
+def test_logview_extend_is_one_change():
+    lv = LogView()
+    start = lv.generation
+    lv.extend(["a", "b\nc", ""])
+    assert lv.text_lines() == ["a", "b", "c", ""]
+    assert lv.generation == start + 1
+    lv.lines = [Text("x"), "y"]
+    assert lv.text_lines() == ["x", "y"]
+
+
+def test_show_lines_measures_only_the_edit(monkeypatch):
+    import conch.logview as logview
+
+    lv = LogView()
+    table = PieceTable(f"line {i}" for i in range(1000))
+    lv.show_lines(table)
+    measured = []
+    monkeypatch.setattr(
+        logview, "cell_len", lambda text: measured.append(text) or len(text)
+    )
+    edited = table.splice(5, 6, ["w" * 80])
+    lv.show_lines(edited)
+    assert measured == ["w" * 80]
+    assert lv.virtual_size.width == 80
+    assert lv.text_lines() == list(edited)
+
+    lv.append("after")
+    assert lv.line_count == 1001
+    assert lv.get_lines(-1) == ["after"]
+    assert len(edited) == 1000
+
+
+def test_highlight_style_change_repaints_old_rows(monkeypatch):
+    lv = LogView()
+    lv.extend(f"line {i}" for i in range(10))
+    refreshed = []
+    monkeypatch.setattr(lv, "refresh_lines", lambda *run: refreshed.append(run))
+    lv.set_highlight(2, 2, "red")
+    refreshed.clear()
+    lv.set_highlight(5, 5, "blue")
+    assert sorted(refreshed) == [(2, 1), (5, 1)]
+    refreshed.clear()
+    lv.set_highlight(6, 6, "blue")
+    assert sorted(refreshed) == [(5, 1), (6, 1)]
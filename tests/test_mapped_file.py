@@ -0,0 +1,122 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(
+    0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "src"))
+)
+from conch import files
+from conch.files import MappedFile, open_lines
+from conch.logview import LogView
+
+
+@pytest.mark.parametrize(
+    "data",
+    [b"", b"a", b"a\n", b"a\nb", b"a\r\nb\r\n\n", b"\n\n", "é\nü".encode()],
+)
+@pytest.mark.parametrize("chunk", [1, 3, 1 << 20])
+def test_mapped_file_splits_like_splitlines(tmp_path, data, chunk):
+    path = tmp_path / "f.txt"
+    path.write_bytes(data)
+    mapped = MappedFile(path)
+    list(mapped.index_steps(chunk))
+    expected = data.decode().splitlines()
+    assert mapped.done
+    assert list(mapped) == expected
+    assert mapped[:] == expected
+    if expected:
+        assert mapped[-1] == expected[-1]
+    mapped.close()
+
+
+def test_mapped_file_grows_while_indexing(tmp_path):
+    path = tmp_path / "big.txt"
+    path.write_text("".join(f"line {i}\n" for i in range(1000)))
+    mapped = MappedFile(path)
+    steps = mapped.index_steps(1000)
+    next(steps)
+    assert 0 < len(mapped) < 1000
+    assert 0 < mapped.progress < 1
+    assert mapped[0] == "line 0"
+    list(steps)
+    assert len(mapped) == 1000
+    assert mapped[999] == "line 999"
+    assert mapped.widest == len("line 999")
+    mapped.close()
+    assert list(mapped.index_steps()) == []
+
+
+def test_open_lines_reports_missing_file(tmp_path):
+    mapped, error = open_lines(tmp_path / "nope")
+    assert mapped is None
+    assert "not found" in error
+
+
+def test_logview_shows_mapped_file(tmp_path):
+    path = tmp_path / "f.txt"
+    path.write_bytes(b"one\ntwo\x07\nthree\n")
+    lv = LogView()
+    lv.append("# header")
+    mapped = MappedFile(path).index()
+    lv.show_file(mapped)
+    lv.append("end")
+    assert lv.line_count == 5
+    assert lv.text_lines() == ["# header", "one", "two", "three", "end"]
+    assert lv.get_lines(1, 3) == ["one", "two"]
+    snapshot = lv.snapshot()
+    lv.clear()
+    assert mapped.stopped
+    assert lv.line_count == 0
+    assert snapshot[1:4] == ["one", "two", "three"]
+
+
+@pytest.mark.asyncio
+async def test_read_path_maps_large_files(tmp_path, monkeypatch):
+    from conch.tui import ConchTUI
+
+    monkeypatch.setattr(files, "LAZY_MIN", 1)
+    monkeypatch.setenv("CONCH_CAS_ROOT", str(tmp_path / "casdir"))
+    path = tmp_path / "big.txt"
+    path.write_text("".join(f"row {i}\n" for i in range(5000)))
+    app = ConchTUI()
+    async with app.run_test() as pilot:
+        assert app._read_path(str(path))
+        assert await app.load_task == 5000
+        await pilot.pause()
+        lines = app.log_view.text_lines()
+        assert lines[0] == f"# {path}"
+        assert lines[1] == "row 0"
+        assert lines[-1] == "§§§"
+        assert len(lines) == 5002
+        assert str(app.busy_indicator.render()) == ":idle"
+
+
+def test_looks_binary():
+    assert not files.looks_binary(b"")
+    assert not files.looks_binary("plain text\twith tabs\r\nand é\n".encode())
+    assert files.looks_binary(b"text\0with a nul")
+    assert files.looks_binary(bytes(range(1, 32)) * 4)
+
+
+def test_load_file_rejects_binary(tmp_path):
+    path = tmp_path / "core"
+    path.write_bytes(b"\x7fELF\0\0" + b"\0" * 100_000)
+    lines, error = files.load_file(path)
+    assert lines is None
+    assert "binary" in error
+    assert files.is_binary_file(path)
+    assert not files.is_binary_file(tmp_path / "missing")
+
+
+def test_hex_preview_reads_only_the_start(tmp_path):
+    path = tmp_path / "blob"
+    path.write_bytes(bytes(range(256)) * 10)
+    lines, error = files.hex_preview(path, limit=32)
+    assert error is None
+    assert lines == [
+        "00000000  00 01 02 03 04 05 06 07  08 09 0a 0b 0c 0d 0e 0f  |................|",
+        "00000010  10 11 12 13 14 15 16 17  18 19 1a 1b 1c 1d 1e 1f  |................|",
+        "... 2,528 more bytes not shown",
+    ]
+    assert files.hex_dump(b"AB", offset=16) == ["00000010  41 42" + " " * 43 + "  |AB|"]
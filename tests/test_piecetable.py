@@ -0,0 +1,87 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(
+    0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "src"))
+)
+from conch.piecetable import MAX_PIECES, PieceTable
+
+
+def test_behaves_like_a_list():
+    lines = ["a", "b", "c", "d"]
+    table = PieceTable(lines)
+    assert table == lines
+    assert lines == table
+    assert len(table) == 4
+    assert table[0] == "a" and table[-1] == "d"
+    assert table[1:3] == ["b", "c"]
+    assert table[::2] == ["a", "c"]
+    assert list(table) == lines
+    assert table != ["a"]
+    with pytest.raises(IndexError):
+        table[4]
+
+
+def test_splice_is_persistent():
+    base = PieceTable(["a", "b", "c", "d"])
+    edited = base.splice(1, 3, ["X", "Y", "Z"])
+    assert edited == ["a", "X", "Y", "Z", "d"]
+    assert base == ["a", "b", "c", "d"]
+    assert edited.delete(0, 2) == ["Y", "Z", "d"]
+    assert edited.insert_lines(5, ["e"]) == ["a", "X", "Y", "Z", "d", "e"]
+    assert edited[2:4] == ["Y", "Z"]
+
+
+def test_splice_matches_slice_assignment():
+    lines = [str(i) for i in range(50)]
+    table = PieceTable(lines)
+    edits = [(3, 7, ["x"]), (0, 0, ["y", "z"]), (-2, -2, []), (40, 60, ["w"])]
+    for start, stop, new in edits:
+        lines[start:stop] = new
+        table = table.splice(start, stop, new)
+        assert table == lines
+
+
+def test_many_edits_stay_bounded():
+    table = PieceTable(str(i) for i in range(10))
+    for i in range(MAX_PIECES + 10):
+        table = table.splice(1, 2, [f"edit {i}"])
+    assert table.piece_count <= MAX_PIECES
+    assert table[1] == f"edit {MAX_PIECES + 9}"
+    assert len(table) == 10
+
+
+def test_diff_bounds_the_change():
+    base = PieceTable(str(i) for i in range(100))
+    edited = base.splice(10, 12, ["a", "b", "c"])
+    assert base.diff(edited) == (10, 12, 13)
+    assert edited.diff(base) == (10, 13, 12)
+    assert base.diff(base) == (100, 100, 100)
+    # Equal lines in unrelated pieces still count as unchanged.
+    copy = PieceTable(list(base)).splice(50, 51, ["x"])
+    assert base.diff(copy) == (50, 51, 51)
+    assert PieceTable().diff(base) == (0, 0, 100)
+
+
+def test_diff_of_repeated_lines():
+    before = PieceTable(["a", "a", "a"])
+    after = before.splice(1, 2)
+    start, stop, other_stop = before.diff(after)
+    assert before[:start] + before[stop:] == after[:start] + after[other_stop:]
+    assert stop - start == 1 and other_stop == start
+
+
+def test_view_shares_its_sources():
+    from conch.linestore import LineStore
+
+    store = LineStore(["x", "y"])
+    table = PieceTable(["a", "b"])
+    view = PieceTable.view(table, [], store)
+    assert view == ["a", "b", "x", "y"]
+    assert view.piece_count == 2
+    store.append("z")
+    assert list(view) == ["a", "b", "x", "y"]
+    assert view.splice(3, 4, ["w"])[3] == "w"
+    assert view.diff(view.splice(2, 3)) == (2, 3, 2)
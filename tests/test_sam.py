@@ -1,11 +1,13 @@
 import os
 import sys
 
+import pytest
+
 sys.path.insert(
     0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "src"))
 )
 
-from conch.sam import Sam
+from conch.sam import Command, Sam, SamParseError, tokenize
 
 sam = Sam()
 buffer = open("tests/scratch.txt").readlines()
@@ -115,3 +117,129 @@ def test_sam_q():
     result, dot = sam.exec("2q", buffer, dot)
     assert result == buffer[:2]
     assert dot == (2, 2)
+
+
+def test_sam_range_d():
+    result, dot = sam.exec("2,4d", ["a", "b", "c", "d", "e"], (0, 0))
+    assert result == ["a", "e"]
+    assert dot == (1, 1)
+
+
+def test_sam_commands_default_to_the_dot():
+    lines = ["a", "b", "c", "d", "e"]
+    assert sam.is_sam_command("d")
+    result, dot = sam.exec("d", lines, (1, 3))
+    assert result == ["a", "d", "e"]
+    assert dot == (1, 1)
+    result, dot = sam.exec("d", lines, (2, 2))
+    assert result == ["a", "b", "d", "e"]
+    result, dot = sam.exec("c/x/", lines, (1, 4))
+    assert result == ["a", "x", "e"]
+    assert dot == (1, 2)
+    result, dot = sam.exec("s/[a-z]/y/", lines, (0, 2))
+    assert result == ["y", "y", "c", "d", "e"]
+    assert dot == (0, 2)
+
+
+def test_sam_whole_buffer_s():
+    result, dot = sam.exec(",s/o/0/", ["foo", "bar", "boo"], (0, 0))
+    assert result == ["f00", "bar", "b00"]
+    assert dot == (0, 3)
+
+
+def test_sam_regex_range_c():
+    buffer2 = ["a", "begin", "x", "y", "end", "z"]
+    result, dot = sam.exec("/begin/,/end/c/gone/", buffer2, (0, 0))
+    assert result == ["a", "gone", "z"]
+    assert dot == (1, 2)
+
+
+def test_sam_dollar_and_regex_search_wraps():
+    result, _ = sam.exec("$d", ["a", "b", "c"], (0, 0))
+    assert result == ["a", "b"]
+    # The search starts after the dot and wraps to the top.
+    result, dot = sam.exec("/a/.", ["a", "b", "c"], (1, 1))
+    assert dot == (0, 1)
+
+
+def test_sam_range_m_t():
+    buffer2 = ["a", "b", "c", "d"]
+    result, dot = sam.exec("1,2m3", buffer2, (0, 0))
+    assert result == ["c", "d", "a", "b"]
+    assert dot == (2, 4)
+    result, dot = sam.exec("1,2t5", buffer2, (0, 0))
+    assert result == ["a", "b", "c", "d", "a", "b"]
+    assert dot == (4, 6)
+
+
+def test_sam_range_errors():
+    with pytest.raises(SamParseError):
+        sam.exec("/nothing/d", ["a", "b"], (0, 0))
+    with pytest.raises(SamParseError):
+        sam.exec("3,1d", ["a", "b", "c"], (0, 0))
+    with pytest.raises(SamParseError, match="out of order"):
+        sam.exec("3,2d", ["a", "b", "c"], (0, 0))
+    result, _ = sam.exec("2,2d", ["a", "b", "c"], (0, 0))
+    assert result == ["a", "c"]
+
+
+def test_sam_x_changes_every_match():
+    buffer2 = ["foo(1)", "bar", "foo(foo)"]
+    result, dot = sam.exec("x/foo/c/baz/", buffer2, (0, 0))
+    assert result == ["baz(1)", "bar", "baz(baz)"]
+    assert dot == (0, 3)
+
+
+def test_sam_x_with_range_and_guard():
+    buffer2 = ["a1", "a2", "b3", "a4"]
+    result, _ = sam.exec("1,3x/[0-9]/g/[12]/c/N/", buffer2, (0, 0))
+    assert result == ["aN", "aN", "b3", "a4"]
+
+
+def test_sam_y_changes_text_between_matches():
+    # The range is one text, "a,b\nc", so "b\nc" is a single piece.
+    result, _ = sam.exec("y/,/c/x/", ["a,b", "c"], (0, 0))
+    assert result == ["x,x"]
+
+
+def test_sam_g_and_v_work_on_lines():
+    buffer2 = ["# comment", "code", "# more", "code 2"]
+    result, dot = sam.exec("g/^#/d", buffer2, (0, 0))
+    assert result == ["code", "code 2"]
+    assert dot == (0, 2)
+    result, _ = sam.exec("v/^#/s/code/CODE/", buffer2, (0, 0))
+    assert result == ["# comment", "CODE", "# more", "CODE 2"]
+
+
+def test_sam_loop_errors():
+    assert sam.is_sam_command("x/re/d")
+    with pytest.raises(SamParseError):
+        sam.exec("x/(/d", ["a"], (0, 0))
+    with pytest.raises(SamParseError):
+        sam.exec("x/a/m3", ["a"], (0, 0))
+
+
+def test_tokenize():
+    assert tokenize("2a/Hello/") == Command("2", False, None, "a", "/Hello/")
+    assert tokenize("/a/,$s/x/y/") == Command("/a/", True, "$", "s", "/x/y/")
+    assert tokenize("..") == Command(".", False, None, ".", "")
+    assert tokenize(".") == Command(None, False, None, ".", "")
+    assert tokenize("x/re/d") == Command(None, False, None, "x", "/re/d")
+    assert tokenize("/usr/bin/env") is None
+    assert tokenize("hello") is None
+
+
+def test_parse_throughput():
+    """A single tokenizing match keeps command parsing cheap."""
+    import timeit
+
+    commands = ["2a/Hello/", "2m8", ",s/a/b/", "/re/,$d", "x/a/c/b/", "text"]
+    n = 2000
+    elapsed = min(
+        timeit.repeat(
+            lambda: [sam.is_sam_command(c) for c in commands], number=n, repeat=3
+        )
+    )
+    rate = n * len(commands) / elapsed
+    print(f"is_sam_command: {rate:,.0f} commands/s")
+    assert rate > 20_000
@@ -18,12 +18,16 @@ def test_command_detection():
     assert sam.is_sam_command("5a/some text/")
     assert sam.is_sam_command("3c/some text/")
     assert sam.is_sam_command("2,3d")
+    assert sam.is_sam_command(",s/a/b/")
+    assert sam.is_sam_command("/re/,$d")
+    assert sam.is_sam_command("$d")
     # Invalid commands (should be treated as text)
     assert not sam.is_sam_command("  1,3d")
     assert not sam.is_sam_command("This is just text")
     assert not sam.is_sam_command("")
     assert not sam.is_sam_command("   ")
     assert not sam.is_sam_command("q")
+    assert not sam.is_sam_command("/usr/bin/env")
     # Escaped commands (should be treated as text)
     assert not sam.is_sam_command("\\2q")
     assert not sam.is_sam_command("\\.q")
@@ -0,0 +1,79 @@
+import asyncio
+import os
+import sys
+
+import pytest
+
+sys.path.insert(
+    0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "src"))
+)
+from conch import commands
+from conch.logview import LogView
+
+
+class _Busy:
+    def __init__(self):
+        self.message = None
+
+    def update(self, msg):
+        self.message = msg
+
+
+class _App:
+    def __init__(self):
+        self.log_view = LogView()
+        self.busy_indicator = _Busy()
+
+
+def _py(code):
+    return f'"{sys.executable}" -c "{code}"'
+
+
+@pytest.mark.asyncio
+async def test_run_shell_streams_merged_output():
+    app = _App()
+    code = await commands.run_shell(
+        app,
+        _py(
+            "import sys; print('out'); sys.stderr.write('err\\\\n'); print('x', end='')"
+        ),
+    )
+    assert code == 0
+    assert app.log_view.text_lines() == ["  out", "  err", "  x"]
+    assert app.busy_indicator.message == ":idle"
+
+
+@pytest.mark.asyncio
+async def test_run_shell_reports_exit_code_and_errors():
+    app = _App()
+    assert await commands.run_shell(app, _py("import sys; sys.exit(3)")) == 3
+    assert await commands.run_shell(app, "no-such-command-xyz") is None
+    lines = app.log_view.text_lines()
+    assert lines[0] == "  (exit 3)"
+    assert lines[1].startswith("  [error]")
+
+
+@pytest.mark.asyncio
+async def test_run_shell_timeout_and_cancel():
+    app = _App()
+    slow = _py("import time; print('started', flush=True); time.sleep(30)")
+    assert await commands.run_shell(app, slow, timeout=0.5) is None
+    assert app.log_view.text_lines()[-2:] == ["  started", f"  [timed out] {slow}"]
+
+    task = asyncio.get_running_loop().create_task(commands.run_shell(app, slow))
+    while app.log_view.line_count < 3:
+        await asyncio.sleep(0.01)
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+    assert app.log_view.text_lines()[-1] == f"  [cancelled] {slow}"
+    assert app.busy_indicator.message == ":idle"
+
+
+def test_shell_timeout_env(monkeypatch):
+    monkeypatch.delenv("CONCH_SHELL_TIMEOUT", raising=False)
+    assert commands.shell_timeout() is None
+    monkeypatch.setenv("CONCH_SHELL_TIMEOUT", "2.5")
+    assert commands.shell_timeout() == 2.5
+    monkeypatch.setenv("CONCH_SHELL_TIMEOUT", "0")
+    assert commands.shell_timeout() is None
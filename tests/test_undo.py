@@ -0,0 +1,96 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(
+    0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "src"))
+)
+from conch.piecetable import PieceTable
+from conch.sam import Sam, SamParseError
+from conch.undo import UndoJournal
+
+
+def test_undo_and_redo_sam_edits():
+    sam = Sam(journal=UndoJournal())
+    buffer, dot = ["a", "b", "c", "d"], (0, 0)
+    buffer, dot = sam.exec("2,3d", buffer, dot)
+    buffer, dot = sam.exec(",s/a/A/", buffer, dot)
+    assert buffer == ["A", "d"]
+    buffer, dot = sam.exec("u", buffer, dot)
+    assert buffer == ["a", "d"]
+    buffer, dot = sam.exec("u", buffer, dot)
+    assert buffer == ["a", "b", "c", "d"]
+    assert dot == (0, 0)
+    buffer, dot = sam.exec("2U", buffer, dot)
+    assert buffer == ["A", "d"]
+    buffer, dot = sam.exec("u 2", buffer, dot)
+    assert buffer == ["a", "b", "c", "d"]
+    buffer, dot = sam.exec("U 2", buffer, dot)
+    assert buffer == ["A", "d"]
+    with pytest.raises(SamParseError, match="Nothing to redo"):
+        sam.exec("U", buffer, dot)
+
+
+def test_new_edit_clears_redo():
+    sam = Sam(journal=UndoJournal())
+    buffer, dot = sam.exec("1c/x/", ["a", "b"], (0, 0))
+    buffer, dot = sam.exec("u", buffer, dot)
+    buffer, dot = sam.exec("2c/y/", buffer, dot)
+    assert not sam.journal.can_redo
+    assert buffer == ["a", "y"]
+
+
+def test_journal_stores_deltas_not_copies():
+    journal = UndoJournal(depth=3)
+    sam = Sam(journal=journal)
+    buffer, dot = [f"line {i}" for i in range(100_000)], (0, 0)
+    for i in range(5):
+        buffer, dot = sam.exec(f"{i + 1}c/edit {i}/", buffer, dot)
+    assert len(journal) == 3
+    assert all(len(d.old) == 1 and len(d.new) == 1 for d in journal._undo)
+    buffer, dot = sam.exec("5u", buffer, dot)
+    assert buffer[:5] == ["edit 0", "edit 1", "line 2", "line 3", "line 4"]
+    with pytest.raises(SamParseError, match="Nothing to undo"):
+        sam.exec("u", buffer, dot)
+
+
+def test_undo_refuses_a_changed_buffer():
+    sam = Sam(journal=UndoJournal())
+    buffer, dot = sam.exec("1c/x/", ["a", "b"], (0, 0))
+    with pytest.raises(SamParseError, match="Cannot undo"):
+        sam.exec("u", ["different", "b"], dot)
+
+
+def test_checkpoints():
+    saved = []
+    journal = UndoJournal(checkpoint=saved.append, checkpoint_every=2)
+    before = PieceTable(["a", "b", "c"])
+    one = before.splice(0, 1, ["A"])
+    two = one.splice(1, 2, ["B"])
+    journal.record(before, one, (0, 0), (0, 1))
+    journal.record(one, two, (0, 1), (1, 2))
+    assert saved == ["A\nB\nc"]
+    assert journal.checkpoints == [(2, None)]
+
+
+def test_undo_needs_a_journal():
+    with pytest.raises(SamParseError):
+        Sam().exec("u", ["a"], (0, 0))
+    assert Sam().is_sam_command("u")
+    assert Sam().is_sam_command("3u")
+    assert Sam().is_sam_command("u 2")
+    assert not Sam().is_sam_command("u and more")
+
+
+def test_undo_checkpoint_env(monkeypatch, tmp_path):
+    from conch import commands
+
+    monkeypatch.setenv("CONCH_CAS_ROOT", str(tmp_path / "casdir"))
+    monkeypatch.delenv("CONCH_UNDO_CHECKPOINT", raising=False)
+    assert commands.undo_checkpoint_every() == 0
+    monkeypatch.setenv("CONCH_UNDO_CHECKPOINT", "25")
+    assert commands.undo_checkpoint_every() == 25
+    hash_value = commands.checkpoint_to_cas("buffer text").result()
+    assert commands.get_cas().get(hash_value) == "buffer text"
+    commands.close_cas()